@@ -9,8 +9,8 @@ https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
-
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
 
+from core.async_views import get_asgi_application  # noqa: E402
+
 application = get_asgi_application()
@@ -0,0 +1,67 @@
+"""sizing of the gunicorn workers from the cpus and memory of the container
+
+used by gunicorn.conf.py and gunicorn_asgi.conf.py, without importing
+Django so the master process stays small before the app is preloaded
+"""
+import os
+
+
+def read_int(path):
+    try:
+        with open(path) as file:
+            return int(file.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def cpu_count():
+    """return the cpus the process may use, honouring a cgroup cpu quota"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = period = None
+    try:
+        # cgroup v2
+        with open('/sys/fs/cgroup/cpu.max') as file:
+            quota, period = file.read().split()[:2]
+        quota = None if quota == 'max' else int(quota)
+        period = int(period)
+    except (OSError, ValueError):
+        # cgroup v1
+        quota = read_int('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        period = read_int('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if quota and quota > 0 and period:
+        cpus = min(cpus, max(1, -(-quota // period)))
+    return cpus
+
+
+def memory_bytes():
+    """return the memory available to the container, or to the host"""
+    limits = [
+        read_int('/sys/fs/cgroup/memory.max'),
+        read_int('/sys/fs/cgroup/memory/memory.limit_in_bytes'),
+    ]
+    try:
+        limits.append(os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES'))
+    except (ValueError, OSError, AttributeError):
+        pass
+    # unlimited cgroups report "max" or a huge number
+    limits = [limit for limit in limits if limit and limit < 1 << 60]
+    return min(limits) if limits else None
+
+
+def worker_count(per_cpu, extra=0):
+    """return per_cpu workers per cpu plus extra, as many as fit in memory
+
+    WEB_CONCURRENCY overrides the count, WORKER_MEMORY_MB is the resident
+    size budgeted per worker, 80% of the memory is shared among them
+    """
+    if os.environ.get('WEB_CONCURRENCY'):
+        return int(os.environ['WEB_CONCURRENCY'])
+    workers = cpu_count() * per_cpu + extra
+    memory = memory_bytes()
+    if memory:
+        per_worker = int(os.environ.get('WORKER_MEMORY_MB', 150)) * 1024 * 1024
+        workers = min(workers, int(memory * 0.8) // per_worker)
+    return max(1, workers)
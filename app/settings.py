@@ -10,21 +10,35 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+
+def env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.1/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = '#9bmpm1xo)r&m3ud((@akp!@14x!90puv%zufkv-fkdf+ke-_4'
+SECRET_KEY = os.environ.get(
+    'SECRET_KEY', '#9bmpm1xo)r&m3ud((@akp!@14x!90puv%zufkv-fkdf+ke-_4'
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DEBUG=1 turns it on for development
+DEBUG = env_bool('DEBUG', False)
 
-ALLOWED_HOSTS = []
+# comma separated host names the site is served under
+ALLOWED_HOSTS = [
+    host for host in os.environ.get('ALLOWED_HOSTS', 'localhost,127.0.0.1').replace(' ', '').split(',')
+    if host
+]
 
 # Application definition
 
@@ -35,9 +49,10 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
-    'core',
+    'core.apps.CoreConfig',
 ]
 
 MIDDLEWARE = [
@@ -73,18 +88,151 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
+# seconds a database connection is kept open for the next requests of a
+# worker, 0 closes it after every request and "none" keeps it forever
+DB_CONN_MAX_AGE = os.environ.get('DB_CONN_MAX_AGE', '60')
+
+# with DB_PGBOUNCER set, DB_HOST and DB_PORT point at a PgBouncer in
+# transaction pooling mode, which keeps no server side cursor open across
+# transactions, so querysets iterated with .iterator() fetch their rows at once
+DB_PGBOUNCER = env_bool('DB_PGBOUNCER', False)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': 'recipeAPI',
-        'USER': 'postgres',
-        'PASSWORD': '1234',
-        'HOST': 'localhost',
-        'PORT': '',
-
+        'NAME': os.environ.get('DB_NAME', 'recipeAPI'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASS', '1234'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        'CONN_MAX_AGE': None if DB_CONN_MAX_AGE.lower() == 'none' else int(DB_CONN_MAX_AGE),
+        'DISABLE_SERVER_SIDE_CURSORS': DB_PGBOUNCER,
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        },
     }
 }
 
+# read only copies of the default database, DB_REPLICAS is a comma separated
+# list of host[:port][/name] with the user and password of the default one,
+# e.g. "localhost/recipeAPI_replica" for a local stand in.
+# core.routers.ReplicaRouter sends the list and retrieve reads of the recipe
+# API to them, except for users who wrote in the last REPLICA_PIN_SECONDS,
+# which every worker only knows from a shared default cache
+DATABASE_REPLICAS = []
+for replica in filter(None, os.environ.get('DB_REPLICAS', '').replace(' ', '').split(',')):
+    address, _, name = replica.partition('/')
+    host, _, port = address.partition(':')
+    alias = f'replica{len(DATABASE_REPLICAS) + 1}'
+    DATABASES[alias] = dict(
+        DATABASES['default'], HOST=host, PORT=port or DATABASES['default']['PORT'],
+        NAME=name or DATABASES['default']['NAME'], TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 5))
+
+# persistent connections dropped by the server are noticed by
+# core.db.check_connections at the start of a request, when the connection
+# was last checked at least DB_HEALTH_CHECK_INTERVAL seconds before, instead
+# of failing the request
+DB_CONN_HEALTH_CHECKS = env_bool('DB_CONN_HEALTH_CHECKS', True)
+DB_HEALTH_CHECK_INTERVAL = float(os.environ.get('DB_HEALTH_CHECK_INTERVAL', 10))
+
+# Caches
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+
+
+def shared_cache(backend):
+    """return False for backends private to each worker process"""
+    return not backend.endswith('LocMemCache')
+
+
+TOKEN_CACHE_ALIAS = 'tokens'
+TOKEN_CACHE_BACKEND = os.environ.get(
+    'TOKEN_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+# revoked tokens and deactivated users are dropped from the cache by the
+# process making the change, the others only see it in a shared cache
+TOKEN_CACHE_ENABLED = env_bool('TOKEN_CACHE_ENABLED', shared_cache(TOKEN_CACHE_BACKEND))
+if TOKEN_CACHE_ENABLED and not shared_cache(TOKEN_CACHE_BACKEND):
+    raise ImproperlyConfigured(
+        'TOKEN_CACHE_ENABLED needs a TOKEN_CACHE_BACKEND shared by the workers'
+    )
+
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_BACKEND = os.environ.get(
+    'RESPONSE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+)
+
+
+# cached lists are invalidated by versions bumped from whichever process or
+# command changed the data, which the other workers only see in a shared
+# cache, e.g. RESPONSE_CACHE_BACKEND=django_redis.cache.RedisCache with
+# RESPONSE_CACHE_LOCATION=redis://redis:6379/1
+RESPONSE_CACHE_ENABLED = env_bool('RESPONSE_CACHE_ENABLED', shared_cache(RESPONSE_CACHE_BACKEND))
+if RESPONSE_CACHE_ENABLED and not shared_cache(RESPONSE_CACHE_BACKEND):
+    raise ImproperlyConfigured(
+        'RESPONSE_CACHE_ENABLED needs a RESPONSE_CACHE_BACKEND shared by the workers'
+    )
+
+CACHES = {
+    # also holds the login throttle counters, use a shared backend when
+    # running several worker processes
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    # token -> user lookups of core.authentication.CachedTokenAuthentication,
+    # only used when TOKEN_CACHE_ENABLED, point TOKEN_CACHE_BACKEND and
+    # TOKEN_CACHE_LOCATION at a redis cache backend to share it between workers
+    TOKEN_CACHE_ALIAS: {
+        'BACKEND': TOKEN_CACHE_BACKEND,
+        'LOCATION': os.environ.get('TOKEN_CACHE_LOCATION', 'tokens'),
+        'TIMEOUT': int(os.environ.get('TOKEN_CACHE_TTL', 300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', 10000)),
+        } if TOKEN_CACHE_BACKEND.endswith('LocMemCache') else {},
+    },
+    # rendered tag, ingredient and recipe lists of recipe.mixins.CachedListMixin
+    # and the per user versions invalidating them, only used when
+    # RESPONSE_CACHE_ENABLED
+    RESPONSE_CACHE_ALIAS: {
+        'BACKEND': RESPONSE_CACHE_BACKEND,
+        'LOCATION': os.environ.get('RESPONSE_CACHE_LOCATION', 'responses'),
+        'TIMEOUT': int(os.environ.get('RESPONSE_CACHE_TTL', 600)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 10000)),
+        } if RESPONSE_CACHE_BACKEND.endswith('LocMemCache') else {},
+    },
+}
+
+if DATABASE_REPLICAS and not shared_cache(CACHES['default']['BACKEND']):
+    raise ImproperlyConfigured(
+        'DB_REPLICAS needs a CACHE_BACKEND shared by the workers to pin writers to the primary'
+    )
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.1/topics/auth/passwords/
+
+# the first hasher hashes new passwords, the others only verify existing
+# hashes, which are upgraded to the first one on the next successful login.
+# PASSWORD_HASHER=argon2 switches to argon2 (requires argon2-cffi)
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'core.hashers.TunedArgon2PasswordHasher',
+]
+if os.environ.get('PASSWORD_HASHER') == 'argon2':
+    PASSWORD_HASHERS.insert(0, PASSWORD_HASHERS.pop())
+
+ARGON2_TIME_COST = int(os.environ.get('ARGON2_TIME_COST', 2))
+ARGON2_MEMORY_COST = int(os.environ.get('ARGON2_MEMORY_COST', 512))
+ARGON2_PARALLELISM = int(os.environ.get('ARGON2_PARALLELISM', 2))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
 
@@ -120,7 +268,75 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
-STATIC_MEDIA = '/media/'
 STATIC_ROOT = '/static'
-STATIC_MEDIA = '/media'
+
+# stored file names already start with media/, so they are served from
+# /media/ below MEDIA_ROOT, kept outside of the project so no source file
+# can be reached through it
+MEDIA_URL = '/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', str(BASE_DIR / 'mediafiles'))
+
+# how uploaded files are delivered: 'python' streams them from the worker,
+# 'x-accel-redirect' hands them to nginx through an internal location
+# aliased to MEDIA_ROOT, e.g.
+#     location /protected-media/ { internal; alias /vol/web/; }
+# and 'x-sendfile' to apache mod_xsendfile or lighttpd
+MEDIA_SERVE_MODE = os.environ.get('MEDIA_SERVE_MODE', 'python')
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media/')
 AUTH_USER_MODEL = 'core.User'
+
+# uploaded recipe images are verified, stripped of metadata, re-encoded and
+# shrunk to RECIPE_IMAGE_MAX_SIZE pixels by a pool of RECIPE_IMAGE_WORKERS
+# threads per process, with 0 only the process_images command handles them
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+RECIPE_IMAGE_MAX_SIZE = int(os.environ.get('RECIPE_IMAGE_MAX_SIZE', 2048))
+# images processing for longer were left by a killed worker, and are queued
+# again when a server process starts
+RECIPE_IMAGE_STALLED_SECONDS = int(os.environ.get('RECIPE_IMAGE_STALLED_SECONDS', 600))
+
+# uploads over these limits are rejected while they are received
+RECIPE_IMAGE_MAX_BYTES = int(os.environ.get('RECIPE_IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+RECIPE_IMAGE_MAX_PIXELS = int(os.environ.get('RECIPE_IMAGE_MAX_PIXELS', 40000000))
+# chunked uploads left unfinished for RECIPE_IMAGE_UPLOAD_EXPIRY seconds are
+# deleted with their partial data, a user has at most
+# RECIPE_IMAGE_MAX_UPLOADS of them open at once
+RECIPE_IMAGE_UPLOAD_EXPIRY = int(os.environ.get('RECIPE_IMAGE_UPLOAD_EXPIRY', 24 * 3600))
+RECIPE_IMAGE_MAX_UPLOADS = int(os.environ.get('RECIPE_IMAGE_MAX_UPLOADS', 5))
+
+# widths of the webp and jpeg renditions offered in image_srcset
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+
+# largest batch accepted by the bulk endpoints, and the rows inserted per query
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 10000))
+BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE', 1000))
+
+# recipes read per server side cursor fetch by the streaming export
+EXPORT_CHUNK_SIZE = int(os.environ.get('EXPORT_CHUNK_SIZE', 2000))
+
+# text search configuration of the recipe search vectors, run
+# update_search_vectors after changing it
+SEARCH_CONFIG = os.environ.get('SEARCH_CONFIG', 'english')
+# longest ?q= accepted by the recipe search
+SEARCH_MAX_LENGTH = int(os.environ.get('SEARCH_MAX_LENGTH', 200))
+
+# serve the reads of the recipe API from a pool of ASYNC_READ_THREADS threads
+# per worker, see core.async_views, only useful under an ASGI server such as
+# the one configured in gunicorn_asgi.conf.py
+ASYNC_READ_VIEWS = env_bool('ASYNC_READ_VIEWS', False)
+ASYNC_READ_THREADS = int(os.environ.get('ASYNC_READ_THREADS', 10))
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'recipe.pagination.KeysetPagination',
+    # default page size of the keyset paginated list endpoints, clients may
+    # ask for a different one with ?page_size=
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', 100)),
+    # clients are told apart by REMOTE_ADDR, behind proxies appending to
+    # X-Forwarded-For set NUM_PROXIES to their number, the header is
+    # otherwise chosen by the client
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # login attempts are throttled before the password is hashed
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': os.environ.get('LOGIN_IP_RATE', '30/min'),
+        'login_email': os.environ.get('LOGIN_EMAIL_RATE', '10/min'),
+    },
+}
@@ -15,11 +15,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
-from django.conf.urls.static import static
-from django.conf import settings
+from core.views import response_cache_stats, serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/',include('user.urls')),
     path('api/recipe/',include('recipe.urls')),
-] + static(settings.MEDIA_URL,document_root=settings.MEDIA_ROOT)
+    path('api/cache-stats/',response_cache_stats,name='cache-stats'),
+    path('media/<path:path>',serve_media,name='media'),
+]
@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import functools
+import django
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
+from core.db import check_connections
+
+
+READ_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_read_executor = None
+
+
+def read_executor():
+    """return the thread pool running the reads of async views
+
+    every thread keeps its own database connection, so the pool size is the
+    number of connections a worker process opens for reads
+    """
+    global _read_executor
+    if _read_executor is None:
+        _read_executor = ThreadPoolExecutor(
+            max_workers=settings.ASYNC_READ_THREADS, thread_name_prefix='async-read'
+        )
+    return _read_executor
+
+
+def run_read(view, request, *args, **kwargs):
+    """run a sync view on a pool thread with the connection upkeep of a request
+
+    the request_started and request_finished signals only reach the
+    connections of the thread running sync views, so the pool threads
+    recycle theirs here. The response is rendered before it leaves the pool.
+    """
+    close_old_connections()
+    check_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if callable(getattr(response, 'render', None)):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_read_view(view):
+    """wrap a sync view so its safe requests run concurrently under ASGI
+
+    Django 3.1 runs sync views on a single thread per ASGI worker, one at a
+    time. The reads of the wrapped view run on the pool of read_executor
+    instead, and everything else keeps the usual single thread so writes
+    behave as under WSGI.
+    """
+    write = sync_to_async(view)
+
+    @functools.wraps(view)
+    async def wrapped(request, *args, **kwargs):
+        if request.method not in READ_METHODS:
+            return await write(request, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(read_executor(), functools.partial(
+            context.run, run_read, view, request, *args, **kwargs
+        ))
+
+    return wrapped
+
+
+def send_streaming(response, send, loop, chunk_bytes):
+    """send the parts of a streaming response from a pool thread
+
+    the parts are produced on the thread iterating the response, so its
+    generator keeps one database connection and may hold a server side
+    cursor. Every part is sent through the loop before the next one is read.
+    """
+    close_old_connections()
+    check_connections()
+    try:
+        for part in response:
+            for chunk, _ in chunk_bytes(part):
+                asyncio.run_coroutine_threadsafe(send({
+                    'type': 'http.response.body',
+                    'body': chunk,
+                    'more_body': True,
+                }), loop).result()
+    finally:
+        # closes the generator on the thread owning its cursor and recycles
+        # the connections of the thread
+        response.close()
+
+
+class StreamingASGIHandler(ASGIHandler):
+    """ASGI handler iterating streaming responses on the read pool
+
+    Django 3.1 iterates streaming responses in the event loop, where the
+    database may not be used, so a response reading from it while it is
+    sent, like the recipe export, fails under ASGI. Their parts are produced
+    on a read_executor thread instead, other responses are sent as usual.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+        response_headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            response_headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            response_headers.append(
+                (b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+            )
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': response_headers,
+        })
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        try:
+            await loop.run_in_executor(read_executor(), functools.partial(
+                context.run, send_streaming, response, send, loop, self.chunk_bytes
+            ))
+            await send({'type': 'http.response.body'})
+        finally:
+            # the view ran on the thread of sync views, recycle its connections
+            await sync_to_async(close_old_connections, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """return the ASGI application of the project, see StreamingASGIHandler"""
+    django.setup(set_prefix=False)
+    return StreamingASGIHandler()
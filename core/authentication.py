@@ -0,0 +1,69 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+def token_cache():
+    """return the cache holding authenticated tokens"""
+    return caches[settings.TOKEN_CACHE_ALIAS]
+
+
+def token_cache_key(key):
+    """return the cache key of a token, without storing the token itself"""
+    return 'auth-token:' + hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def user_token_cache_key(user_id):
+    """return the cache key of the token key issued to a user"""
+    return f'user-token:{user_id}'
+
+
+def invalidate_tokens(*keys):
+    """drop tokens from the cache so the next request reloads them"""
+    token_cache().delete_many([token_cache_key(key) for key in keys])
+
+
+def get_user_token(user):
+    """return the token key of user, creating the token on first login"""
+    if not settings.TOKEN_CACHE_ENABLED:
+        return Token.objects.get_or_create(user=user)[0].key
+    cache = token_cache()
+    cache_key = user_token_cache_key(user.pk)
+    key = cache.get(cache_key)
+    if key is None:
+        token, created = Token.objects.get_or_create(user=user)
+        key = token.key
+        cache.set(cache_key, key)
+    return key
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """token authentication that caches the token and its user
+
+    cached entries are dropped when the token is deleted or its user is
+    saved, and expire after the cache timeout otherwise. without
+    TOKEN_CACHE_ENABLED every request is checked against the database
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.TOKEN_CACHE_ENABLED:
+            return super().authenticate_credentials(key)
+        cache = token_cache()
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            model = self.get_model()
+            try:
+                token = model.objects.select_related('user').get(key=key)
+            except model.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_('Invalid token.'))
+            cache.set(cache_key, token)
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        return (token.user, token)
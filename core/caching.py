@@ -0,0 +1,91 @@
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+HITS_KEY = 'response-cache:hits'
+MISSES_KEY = 'response-cache:misses'
+
+
+def response_cache():
+    """return the cache holding rendered list responses"""
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def user_version_key(user_id):
+    return f'response-version:{user_id}'
+
+
+def new_version():
+    # versions restart from the clock when the counter is evicted, so they
+    # never fall back to a version responses are still cached under
+    return time.time_ns() // 1000
+
+
+def get_user_version(user_id):
+    """return the current version of the cached responses of a user"""
+    cache = response_cache()
+    key = user_version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, new_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(user_id):
+    cache = response_cache()
+    try:
+        cache.incr(user_version_key(user_id))
+    except ValueError:
+        cache.set(user_version_key(user_id), new_version(), timeout=None)
+
+
+def bump_user_version(*user_ids):
+    """invalidate every cached response of the given users
+
+    the version is bumped right away and again once the transaction commits,
+    so a response rendered from data read before the commit is not kept
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return
+    for user_id in set(user_ids):
+        _bump(user_id)
+        transaction.on_commit(lambda user_id=user_id: _bump(user_id))
+
+
+def response_cache_key(request, name, version):
+    """return the cache key of a response to request for the user"""
+    url = request.build_absolute_uri()
+    digest = hashlib.sha256(f'{request.accepted_media_type}|{url}'.encode('utf-8')).hexdigest()
+    return f'response:{request.user.pk}:{version}:{name}:{digest}'
+
+
+def record_lookup(hit):
+    """count a hit or a miss of the response cache"""
+    cache = response_cache()
+    key = HITS_KEY if hit else MISSES_KEY
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def cache_stats():
+    """return the hit and miss counts of the response cache"""
+    counts = response_cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = counts.get(HITS_KEY, 0)
+    misses = counts.get(MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / lookups if lookups else None,
+    }
+
+
+def reset_cache_stats():
+    response_cache().delete_many([HITS_KEY, MISSES_KEY])
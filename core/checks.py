@@ -0,0 +1,14 @@
+from django.core.checks import Error, register
+from PIL import features
+
+
+@register()
+def check_webp_support(app_configs, **kwargs):
+    """check Pillow can encode and decode webp, the format of the renditions"""
+    if features.check('webp'):
+        return []
+    return [Error(
+        'Pillow was built without webp support.',
+        hint='Install libwebp and its headers before installing Pillow.',
+        id='core.E001',
+    )]
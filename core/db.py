@@ -0,0 +1,44 @@
+import time
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def mark_checked(connection):
+    """record that connection was just known to work, e.g. when it opened"""
+    connection.health_checked_at = time.monotonic()
+
+
+def check_connections():
+    """close the persistent connections the database server has dropped
+
+    run when a request starts, after Django closed the connections past
+    CONN_MAX_AGE, so the request opens a new connection instead of failing
+    on the dead one. A connection is checked with a round trip at most once
+    every DB_HEALTH_CHECK_INTERVAL seconds.
+    """
+    if not settings.DB_CONN_HEALTH_CHECKS:
+        return
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        checked_at = getattr(connection, 'health_checked_at', None)
+        if checked_at is not None and now - checked_at < settings.DB_HEALTH_CHECK_INTERVAL:
+            continue
+        if connection.is_usable():
+            mark_checked(connection)
+        else:
+            connection.close()
+            connection.health_checked_at = None
+
+
+def advisory_lock(key):
+    """lock key until the end of the current transaction, on PostgreSQL
+
+    for check then act sequences on things outside the database, like files,
+    that no row can be locked for. Other databases take no lock.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [key])
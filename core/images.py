@@ -0,0 +1,268 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from core.caching import bump_user_version
+from core.db import advisory_lock
+from core.models import Recipe
+
+
+logger = logging.getLogger(__name__)
+
+# formats images are accepted and re-encoded in, files in any other format
+# are marked failed without being decoded
+KEPT_FORMATS = ('JPEG', 'PNG', 'WEBP', 'GIF')
+
+# formats renditions are available in, by file extension
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """return the process wide image worker pool, created on first use"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-image',
+            )
+        return _executor
+
+
+def enqueue_image(recipe):
+    """queue the image of recipe for processing once the transaction commits
+
+    the pending status is the queue itself, images are picked up by the in
+    process worker pool or by the process_images management command
+    """
+    ready = Recipe.objects.filter(
+        image=recipe.image.name, image_status=Recipe.IMAGE_READY
+    ).exclude(pk=recipe.pk).exists()
+    if ready:
+        # the same content was uploaded and processed before
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image_status=Recipe.IMAGE_READY, updated_at=timezone.now()
+        )
+        recipe.image_status = Recipe.IMAGE_READY
+        bump_user_version(recipe.user_id)
+        return
+    Recipe.objects.filter(pk=recipe.pk).update(
+        image_status=Recipe.IMAGE_PENDING, updated_at=timezone.now()
+    )
+    recipe.image_status = Recipe.IMAGE_PENDING
+    bump_user_version(recipe.user_id)
+    if settings.RECIPE_IMAGE_WORKERS > 0:
+        transaction.on_commit(lambda: get_executor().submit(_run, recipe.pk))
+
+
+def start_workers():
+    """start the worker pool and hand it the images queued before it started
+
+    called when a server process starts, e.g. from gunicorn's
+    post_worker_init, so images left behind by a killed worker are picked up
+    """
+    if settings.RECIPE_IMAGE_WORKERS > 0:
+        get_executor().submit(_drain)
+
+
+def _drain():
+    close_old_connections()
+    try:
+        requeue_stalled_images()
+        process_pending_images()
+    except Exception:
+        logger.exception('processing queued images failed')
+    finally:
+        close_old_connections()
+
+
+def _run(recipe_id):
+    """process an image from a worker thread"""
+    close_old_connections()
+    try:
+        process_image(recipe_id)
+    except Exception:
+        logger.exception('processing image of recipe %s failed', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def render_image(file, max_size):
+    """return the verified, re-encoded image bytes of file without metadata"""
+    image = Image.open(file)
+    if image.format not in KEPT_FORMATS:
+        raise ValueError(f'unsupported image format {image.format}')
+    image.verify()
+    file.seek(0)
+    image = Image.open(file)
+    fmt = image.format
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_size, max_size))
+
+    options = {}
+    if fmt == 'JPEG':
+        image = image.convert('RGB')
+        options = {'quality': 85, 'optimize': True, 'progressive': True}
+    elif fmt == 'PNG':
+        options = {'optimize': True}
+    output = BytesIO()
+    image.save(output, format=fmt, **options)
+    return output.getvalue()
+
+
+def replace_file(path, data):
+    """atomically replace the file at path with data
+
+    the data is written next to the file and renamed over it, readers see
+    either the old or the new content and the name never changes
+    """
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def process_image(recipe_id):
+    """process the pending image of a recipe, return False if none was claimed
+
+    recipes sharing the same stored image are settled together, the file is
+    processed once in place and every recipe pointing at it gets the result.
+    the name and image_sha256 stay the hash of the uploaded bytes, it is the
+    key identical uploads are matched on, not the hash of the stored file
+    """
+    recipe = Recipe.objects.filter(pk=recipe_id, image_status=Recipe.IMAGE_PENDING).first()
+    if recipe is None:
+        return False
+    name = recipe.image.name
+    shared = Recipe.objects.filter(image=name)
+    if shared.filter(image_status=Recipe.IMAGE_PROCESSING).exists():
+        # the worker processing the file settles this recipe as well
+        return False
+    claimed = shared.filter(
+        pk=recipe_id, image_status=Recipe.IMAGE_PENDING
+    ).update(image_status=Recipe.IMAGE_PROCESSING, updated_at=timezone.now())
+    if not claimed:
+        return False
+
+    if shared.filter(image_status=Recipe.IMAGE_READY).exists():
+        status = Recipe.IMAGE_READY
+    else:
+        try:
+            with recipe.image.open('rb') as file:
+                data = render_image(file, settings.RECIPE_IMAGE_MAX_SIZE)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError):
+            logger.warning('image of recipe %s is invalid', recipe_id, exc_info=True)
+            status = Recipe.IMAGE_FAILED
+        else:
+            replace_file(recipe.image.storage.path(name), data)
+            status = Recipe.IMAGE_READY
+
+    # the image may have been replaced while it was processed
+    settled = shared.filter(image_status__in=(Recipe.IMAGE_PENDING, Recipe.IMAGE_PROCESSING))
+    user_ids = list(settled.values_list('user_id', flat=True))
+    settled.update(image_status=status, updated_at=timezone.now())
+    bump_user_version(*user_ids)
+    return True
+
+
+def process_pending_images(limit=None):
+    """process queued images in id order, return how many were processed"""
+    pending = Recipe.objects.filter(image_status=Recipe.IMAGE_PENDING).order_by('id')
+    ids = pending.values_list('id', flat=True)
+    if limit:
+        ids = ids[:limit]
+    return sum(process_image(recipe_id) for recipe_id in list(ids))
+
+
+def requeue_stalled_images():
+    """requeue images left processing longer than RECIPE_IMAGE_STALLED_SECONDS
+
+    their worker was killed or crashed, processing an image takes seconds
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.RECIPE_IMAGE_STALLED_SECONDS)
+    stalled = Recipe.objects.filter(image_status=Recipe.IMAGE_PROCESSING, updated_at__lt=cutoff)
+    user_ids = list(stalled.values_list('user_id', flat=True))
+    requeued = stalled.update(image_status=Recipe.IMAGE_PENDING, updated_at=timezone.now())
+    bump_user_version(*user_ids)
+    return requeued
+
+
+def release_image(storage, name):
+    """delete a stored image and its renditions once no recipe references it
+
+    the name is locked like in store_image, so a file being reused by an
+    upload is either referenced before the check or stored again after the
+    delete. return the number of bytes freed
+    """
+    with transaction.atomic():
+        advisory_lock(name)
+        if Recipe.objects.filter(image=name).exists():
+            return 0
+        freed = 0
+        names = [name] + [
+            rendition_name(name, width, ext)
+            for width in settings.RECIPE_IMAGE_WIDTHS for ext in RENDITION_FORMATS
+        ]
+        for stored in names:
+            if storage.exists(stored):
+                freed += storage.size(stored)
+                storage.delete(stored)
+        return freed
+
+
+def rendition_name(name, width, ext):
+    """return the storage name of a rendition, next to the original image"""
+    root, _ = os.path.splitext(name)
+    return f'{root}_{width}w.{ext}'
+
+
+def render_rendition(file, width, ext):
+    """return the bytes of file scaled down to width in the format of ext"""
+    image = ImageOps.exif_transpose(Image.open(file))
+    if image.width > width:
+        height = max(1, round(image.height * width / image.width))
+        image = image.resize((width, height), Image.LANCZOS)
+    fmt = RENDITION_FORMATS[ext][0]
+    if fmt == 'JPEG' or image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+    output = BytesIO()
+    image.save(output, format=fmt, quality=80)
+    return output.getvalue()
+
+
+def get_rendition(recipe, width, ext):
+    """return the storage name of a rendition of the recipe image
+
+    renditions are rendered on first request and kept in storage, so every
+    width and format is only rendered once per image
+    """
+    name = rendition_name(recipe.image.name, width, ext)
+    storage = recipe.image.storage
+    if not storage.exists(name):
+        with recipe.image.open('rb') as file:
+            data = render_rendition(file, width, ext)
+        saved = storage.save(name, ContentFile(data))
+        if saved != name:
+            # rendered concurrently by another request
+            storage.delete(saved)
+    return name
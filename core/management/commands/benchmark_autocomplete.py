@@ -0,0 +1,112 @@
+import random
+import statistics
+import time
+import uuid
+from urllib.parse import parse_qs, urlsplit
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core.caching import bump_user_version
+from core.models import Ingredient
+from recipe.views import IngredientViewSet
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the ingredient autocomplete endpoint
+
+    seeds a throwaway user with ingredients, then times typing prefixes of
+    their names against the autocomplete action and against fetching the
+    whole paginated list, as the typeahead used to do
+    """
+    help = 'seed ingredients and compare autocomplete with downloading the full list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=100000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--cached', action='store_true',
+            help='let repeated requests hit the response cache',
+        )
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='keep the seeded data instead of deleting it afterwards',
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email=f'benchmark-{uuid.uuid4().hex}@example.com'
+        )
+        try:
+            names = self.seed(user, options)
+            self.cached = options['cached']
+            # a host in the default ALLOWED_HOSTS
+            factory = APIRequestFactory(SERVER_NAME='localhost')
+            prefixes = [
+                name[:random.randint(1, 4)].lower()
+                for name in random.choices(names, k=options['requests'])
+            ]
+            autocomplete = IngredientViewSet.as_view({'get': 'autocomplete'})
+            self.report('autocomplete', [
+                self.timed(user, autocomplete, factory.get('/', {'q': prefix}))
+                for prefix in prefixes
+            ])
+            listing = IngredientViewSet.as_view({'get': 'list'})
+            self.report('full list', [
+                self.fetch_all(user, listing, factory)
+                for _prefix in prefixes[:max(1, len(prefixes) // 20)]
+            ])
+        finally:
+            if not options['keep']:
+                self.stdout.write('deleting seeded data ...')
+                user.delete()
+
+    def seed(self, user, options):
+        words = ('tomato', 'potato', 'onion', 'garlic', 'pepper', 'basil', 'rice', 'bean')
+        names = [
+            f'{random.choice(words)} {i}' for i in range(options['ingredients'])
+        ]
+        Ingredient.objects.bulk_create(
+            [Ingredient(user=user, name=name) for name in names],
+            batch_size=options['batch_size'],
+        )
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Ingredient._meta.db_table}')
+        self.stdout.write(f'{len(names)} ingredients created')
+        return names
+
+    def timed(self, user, view, request):
+        """return the milliseconds view took to render request"""
+        if not self.cached:
+            bump_user_version(user.pk)
+        force_authenticate(request, user=user)
+        started = time.perf_counter()
+        view(request).render()
+        return (time.perf_counter() - started) * 1000
+
+    def fetch_all(self, user, view, factory):
+        """return the milliseconds taken to follow every page of the list"""
+        if not self.cached:
+            bump_user_version(user.pk)
+        elapsed = 0
+        params = {'page_size': 1000}
+        while True:
+            request = factory.get('/', params)
+            force_authenticate(request, user=user)
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            elapsed += (time.perf_counter() - started) * 1000
+            if not response.data['next']:
+                return elapsed
+            params['cursor'] = parse_qs(urlsplit(response.data['next']).query)['cursor'][0]
+
+    def report(self, name, timings):
+        timings = sorted(timings)
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{name}: {len(timings)} requests, median {statistics.median(timings):.1f}ms,'
+            f' p95 {p95:.1f}ms'
+        ))
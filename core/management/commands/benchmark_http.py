@@ -0,0 +1,128 @@
+import statistics
+import threading
+import time
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.servers.basehttp import WSGIRequestHandler, WSGIServer
+from django.core.wsgi import get_wsgi_application
+from core.authentication import get_user_token
+from core.models import Recipe
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(WSGIServer):
+    """WSGI server handling requests on a fixed pool of threads
+
+    like the threads of a production worker, and unlike a thread per
+    request, they keep their database connections between requests
+    """
+
+    def __init__(self, *args, threads, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+class Command(BaseCommand):
+    """Django command to measure requests per second with and without
+    persistent database connections
+
+    serves the project on a local WSGI server with a pool of threads, first with
+    CONN_MAX_AGE=0 so every request connects to the database, then with the
+    configured CONN_MAX_AGE, and requests a recipe of a throwaway user from
+    several client threads
+    """
+    help = 'compare requests per second with and without persistent database connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--path', help='path to request, the detail of a seeded recipe by default',
+        )
+        parser.add_argument(
+            '--host', default='localhost',
+            help='Host header sent, must be in ALLOWED_HOSTS',
+        )
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.create_user(
+            email=f'benchmark-{uuid.uuid4().hex}@example.com'
+        )
+        try:
+            recipe = Recipe.objects.create(user=user, title='benchmark', time_minutes=5, price=5)
+            self.token = get_user_token(user)
+            path = options['path'] or f'/api/recipe/recipes/{recipe.pk}/'
+            configured = settings.DATABASES['default'].get('CONN_MAX_AGE', 0)
+            runs = [('new connection per request', 0)]
+            if configured != 0:
+                runs.append((f'CONN_MAX_AGE={configured}', configured))
+            else:
+                self.stdout.write(self.style.WARNING(
+                    'CONN_MAX_AGE is 0, set DB_CONN_MAX_AGE to compare with persistent connections'
+                ))
+            for name, max_age in runs:
+                settings.DATABASES['default']['CONN_MAX_AGE'] = max_age
+                self.report(name, self.run(path, options))
+            settings.DATABASES['default']['CONN_MAX_AGE'] = configured
+        finally:
+            user.delete()
+
+    def run(self, path, options):
+        """return the elapsed seconds and the latency of every request"""
+        server = PooledWSGIServer(
+            ('127.0.0.1', 0), QuietRequestHandler, threads=options['concurrency']
+        )
+        server.set_app(get_wsgi_application())
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        url = f'http://127.0.0.1:{server.server_port}{path}'
+        headers = {'Authorization': f'Token {self.token}', 'Host': options['host']}
+
+        def fetch(_index):
+            request = urllib.request.Request(url, headers=headers)
+            started = time.perf_counter()
+            with urllib.request.urlopen(request) as response:
+                response.read()
+            return (time.perf_counter() - started) * 1000
+
+        try:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                latencies = list(executor.map(fetch, range(options['requests'])))
+            return time.perf_counter() - started, latencies
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def report(self, name, result):
+        elapsed, latencies = result
+        latencies.sort()
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{name}: {len(latencies) / elapsed:.0f} requests/s,'
+            f' median {statistics.median(latencies):.1f}ms, p95 {p95:.1f}ms'
+        ))
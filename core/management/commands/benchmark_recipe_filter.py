@@ -0,0 +1,120 @@
+import random
+import time
+import uuid
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.models import Tag, Ingredient, Recipe
+from recipe.filters import MATCH_ALL, MATCH_ANY, filter_by_related
+
+
+class Command(BaseCommand):
+    """Django command to benchmark the recipe tag and ingredient filters
+
+    seeds a throwaway user with the requested number of recipes and links,
+    then prints the query plan and timing of each filter mode
+    """
+    help = 'seed recipes and print the query plans of the recipe filters'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument(
+            '--links', type=int, default=5,
+            help='tags and ingredients linked to each recipe',
+        )
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='keep the seeded data instead of deleting it afterwards',
+        )
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        user = get_user_model().objects.create_user(
+            email=f'benchmark-{uuid.uuid4().hex}@example.com'
+        )
+        try:
+            tag_ids, ingredient_ids = self.seed(user, options)
+            self.report(user, tag_ids, ingredient_ids, options['page_size'])
+        finally:
+            if not options['keep']:
+                self.stdout.write('deleting seeded data ...')
+                user.delete()
+
+    def seed(self, user, options):
+        """create tags, ingredients, recipes and their links for user"""
+        started = time.monotonic()
+        Tag.objects.bulk_create(
+            [Tag(user=user, name=f'tag{i}') for i in range(options['tags'])],
+            batch_size=self.batch_size,
+        )
+        Ingredient.objects.bulk_create(
+            [Ingredient(user=user, name=f'ingredient{i}') for i in range(options['ingredients'])],
+            batch_size=self.batch_size,
+        )
+        tag_ids = list(Tag.objects.filter(user=user).values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.filter(user=user).values_list('id', flat=True))
+
+        for start in range(0, options['recipes'], self.batch_size):
+            count = min(self.batch_size, options['recipes'] - start)
+            Recipe.objects.bulk_create([
+                Recipe(user=user, title=f'recipe{start + i}', time_minutes=i % 120, price=i % 100)
+                for i in range(count)
+            ])
+        self.stdout.write(f"{options['recipes']} recipes created")
+
+        links = min(options['links'], len(tag_ids), len(ingredient_ids))
+        tag_through = Recipe.tag.through
+        ingredient_through = Recipe.ingredient.through
+        tag_rows, ingredient_rows = [], []
+        recipe_ids = Recipe.objects.filter(user=user).values_list('id', flat=True)
+        for recipe_id in recipe_ids.iterator(chunk_size=self.batch_size):
+            tag_rows.extend(
+                tag_through(recipe_id=recipe_id, tag_id=tag_id)
+                for tag_id in random.sample(tag_ids, links)
+            )
+            ingredient_rows.extend(
+                ingredient_through(recipe_id=recipe_id, ingredient_id=ingredient_id)
+                for ingredient_id in random.sample(ingredient_ids, links)
+            )
+            if len(tag_rows) >= self.batch_size:
+                tag_through.objects.bulk_create(tag_rows)
+                ingredient_through.objects.bulk_create(ingredient_rows)
+                tag_rows, ingredient_rows = [], []
+        tag_through.objects.bulk_create(tag_rows)
+        ingredient_through.objects.bulk_create(ingredient_rows)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                for table in (Recipe._meta.db_table, tag_through._meta.db_table,
+                              ingredient_through._meta.db_table):
+                    cursor.execute(f'ANALYZE {table}')
+        self.stdout.write(f'seeded in {time.monotonic() - started:.1f}s')
+        return tag_ids, ingredient_ids
+
+    def report(self, user, tag_ids, ingredient_ids, page_size):
+        """print plan and timing of every filter mode"""
+        base = Recipe.objects.filter(user=user)
+        scenarios = [
+            ('any tags', filter_by_related(base, 'tag', tag_ids[:3], MATCH_ANY)),
+            ('all tags', filter_by_related(base, 'tag', tag_ids[:2], MATCH_ALL)),
+            ('any ingredients', filter_by_related(base, 'ingredient', ingredient_ids[:3], MATCH_ANY)),
+            ('all tags and ingredients', filter_by_related(
+                filter_by_related(base, 'tag', tag_ids[:2], MATCH_ALL),
+                'ingredient', ingredient_ids[:1], MATCH_ALL,
+            )),
+        ]
+        explain_options = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        for name, queryset in scenarios:
+            page = queryset.order_by('-id')[:page_size]
+            started = time.monotonic()
+            rows = len(list(page.values_list('id', flat=True)))
+            elapsed = (time.monotonic() - started) * 1000
+            plan = page.explain(**explain_options)
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: {rows} rows in {elapsed:.1f}ms'))
+            self.stdout.write(plan)
+            if 'Seq Scan' in plan:
+                self.stdout.write(self.style.WARNING('sequential scan in plan'))
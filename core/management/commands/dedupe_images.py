@@ -0,0 +1,89 @@
+import os
+import re
+from django.core.management.base import BaseCommand
+from PIL import Image
+from core.caching import bump_user_version
+from core.images import release_image
+from core.models import Recipe, recipe_image_content_patch
+from core.uploads import FORMAT_EXTENSIONS, file_sha256
+
+
+CONTENT_NAME = re.compile(r'[0-9a-f]{64}')
+
+
+class Command(BaseCommand):
+    """Django command to move recipe images stored before content addressing
+
+    every image is renamed after the sha256 of its content, recipes holding
+    identical images end up sharing one file and the copies are deleted
+    """
+    help = 'store recipe images by content and delete duplicate files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='report the space that would be saved without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        storage = Recipe._meta.get_field('image').storage
+        names = (
+            Recipe.objects.exclude(image='').exclude(image__isnull=True)
+            .exclude(image_status=Recipe.IMAGE_PROCESSING)
+            .values_list('image', flat=True).distinct().order_by('image')
+        )
+        targets = set()
+        moved = merged = saved = 0
+        for name in list(names):
+            stem = os.path.splitext(os.path.basename(name))[0]
+            if CONTENT_NAME.fullmatch(stem) or not storage.exists(name):
+                continue
+            path = storage.path(name)
+            sha256 = file_sha256(path)
+            try:
+                with Image.open(path) as image:
+                    fmt = image.format
+            except (OSError, SyntaxError, ValueError):
+                self.stderr.write(f'{name} is not an image, skipped')
+                continue
+            target = recipe_image_content_patch(
+                sha256, FORMAT_EXTENSIONS.get(fmt, fmt.lower())
+            )
+            duplicate = target in targets or storage.exists(target)
+            targets.add(target)
+            if duplicate:
+                merged += 1
+                saved += storage.size(name)
+            else:
+                moved += 1
+            if dry_run:
+                continue
+
+            if not duplicate:
+                os.makedirs(os.path.dirname(storage.path(target)), exist_ok=True)
+                os.replace(path, storage.path(target))
+            recipes = Recipe.objects.filter(image=name)
+            user_ids = list(recipes.values_list('user_id', flat=True))
+            recipes.update(image=target, image_sha256=sha256)
+            bump_user_version(*user_ids)
+            release_image(storage, name)
+
+        self.backfill_hashes(storage, dry_run)
+
+        prefix = 'would save' if dry_run else 'saved'
+        self.stdout.write(self.style.SUCCESS(
+            f'{moved} images moved, {merged} duplicates merged, {prefix} {saved} bytes'
+        ))
+
+    def backfill_hashes(self, storage, dry_run):
+        """record the content hash of images stored under content names"""
+        missing = (
+            Recipe.objects.filter(image_sha256='').exclude(image='')
+            .exclude(image__isnull=True).values_list('image', flat=True).distinct()
+        )
+        for name in list(missing):
+            stem = os.path.splitext(os.path.basename(name))[0]
+            if not CONTENT_NAME.fullmatch(stem) or dry_run:
+                continue
+            Recipe.objects.filter(image=name, image_sha256='').update(image_sha256=stem)
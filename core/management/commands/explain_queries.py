@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from rest_framework.settings import api_settings
+from core.models import Recipe
+from recipe import views
+
+
+def has_seq_scan(plan):
+    """return True if an explain plan reads a whole table"""
+    if connection.vendor == 'postgresql':
+        return 'Seq Scan' in plan
+    return any(
+        line.split()[3:4] == ['SCAN'] and 'USING' not in line
+        for line in plan.splitlines()
+    )
+
+
+class Command(BaseCommand):
+    """Django command to explain the queries run by the recipe API viewsets"""
+    help = 'run EXPLAIN ANALYZE on every viewset list query and flag sequential scans'
+
+    viewsets = (
+        ('tags', views.TagViewSet, {}),
+        ('tags assigned only', views.TagViewSet, {'assigned_only': '1'}),
+        ('ingredients', views.IngredientViewSet, {}),
+        ('ingredients assigned only', views.IngredientViewSet, {'assigned_only': '1'}),
+        ('recipes', views.RecipeViewSet, {}),
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--email',
+            help='user to run the queries for, defaults to the user with most recipes',
+        )
+        parser.add_argument(
+            '--fail-on-seq-scan', action='store_true',
+            help='exit with an error if any plan has a sequential scan',
+        )
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['email'])
+        self.stdout.write(f'explaining queries for {user.email}')
+        flagged = []
+        for name, queryset in self.get_querysets(user):
+            if connection.vendor == 'postgresql':
+                plan = queryset.explain(analyze=True)
+            else:
+                plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(plan)
+            if has_seq_scan(plan):
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING('sequential scan'))
+
+        if flagged and options['fail_on_seq_scan']:
+            raise CommandError(f"sequential scans in: {', '.join(flagged)}")
+        if not flagged:
+            self.stdout.write(self.style.SUCCESS('no sequential scans'))
+
+    def get_user(self, email):
+        users = get_user_model().objects.all()
+        if email:
+            user = users.filter(email=email).first()
+        else:
+            user = users.annotate(recipes=Count('recipe')).order_by('-recipes').first()
+        if user is None:
+            raise CommandError('no user to explain queries for')
+        return user
+
+    def get_querysets(self, user):
+        """yield the first page query of every viewset as the API would run it"""
+        factory = APIRequestFactory()
+        page_size = api_settings.PAGE_SIZE
+        for name, viewset, params in self.viewsets:
+            request = Request(factory.get('/', params))
+            request.user = user
+            view = viewset(request=request, action='list', format_kwarg=None)
+            yield name, view.get_queryset()[:page_size + 1]
+
+        recipe_ids = list(
+            Recipe.objects.filter(user=user).order_by('-id').values_list('id', flat=True)[:page_size]
+        )
+        if not recipe_ids:
+            return
+        yield 'recipe tags prefetch', Recipe.tag.through.objects.filter(recipe_id__in=recipe_ids)
+        yield 'recipe ingredients prefetch', Recipe.ingredient.through.objects.filter(
+            recipe_id__in=recipe_ids
+        )
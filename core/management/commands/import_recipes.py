@@ -0,0 +1,221 @@
+import csv
+import io
+import itertools
+import json
+import sys
+import time
+from decimal import Decimal, InvalidOperation
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from core.caching import bump_user_version
+from core.models import Tag, Ingredient, Recipe
+from core.search import update_search_vectors
+from recipe.export import CSV_LIST_SEPARATOR, EXPORT_CSV, EXPORT_NDJSON
+from recipe.mixins import insert_objects
+
+
+RELATIONS = (('tags', 'tag', Tag), ('ingredients', 'ingredient', Ingredient))
+
+
+def parse_names(value):
+    """return the names of a csv cell or an ndjson list, without blanks
+
+    csv cells hold a json list, or names separated by CSV_LIST_SEPARATOR
+    """
+    if isinstance(value, str):
+        try:
+            names = json.loads(value) if value.lstrip().startswith('[') else None
+        except ValueError:
+            names = None
+        value = names if isinstance(names, list) else value.split(CSV_LIST_SEPARATOR)
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [name.strip() for name in value or () if name and name.strip()]
+
+
+def parse_recipe(record, line):
+    """return a clean recipe dict from an input record, or raise CommandError"""
+    try:
+        title = str(record['title']).strip()
+        time_minutes = int(record['time_minutes'])
+        price = Decimal(str(record['price'])).quantize(Decimal('0.01'))
+    except (KeyError, TypeError, ValueError, InvalidOperation) as error:
+        raise CommandError(f'line {line}: invalid recipe ({error!r})')
+    link = str(record.get('link') or '')
+    if not title or len(title) > 255 or len(link) > 255 or abs(price) >= 1000:
+        raise CommandError(f'line {line}: invalid recipe')
+    recipe = {'title': title, 'time_minutes': time_minutes, 'price': price, 'link': link}
+    for key, _field, _model in RELATIONS:
+        recipe[key] = [name[:255] for name in parse_names(record.get(key))]
+    return recipe
+
+
+def read_records(file, input_format):
+    """yield (line, record) of an ndjson or csv file"""
+    if input_format == EXPORT_CSV:
+        for record in csv.DictReader(file):
+            yield None, record
+        return
+    for line, text in enumerate(file, 1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except ValueError:
+                raise CommandError(f'line {line}: invalid json')
+
+
+class Command(BaseCommand):
+    """Django command to import recipes exported by the recipe export endpoint
+
+    on PostgreSQL each batch is copied into temporary staging tables and
+    merged with a few set based statements, tags and ingredients are matched
+    by name and only missing ones are created for the user
+    """
+    help = 'import recipes with their tags and ingredients from an NDJSON or CSV file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="file to import, or - for stdin")
+        parser.add_argument('--email', required=True, help='user owning the imported recipes')
+        parser.add_argument(
+            '--format', dest='input_format', choices=(EXPORT_NDJSON, EXPORT_CSV),
+            help='input format, guessed from the file extension by default',
+        )
+        parser.add_argument('--batch-size', type=int, default=50000)
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user with email {options["email"]}')
+        path = options['path']
+        input_format = options['input_format'] or (
+            EXPORT_CSV if path.endswith('.csv') else EXPORT_NDJSON
+        )
+        load = self.load_postgresql if connection.vendor == 'postgresql' else self.load_orm
+
+        started = time.monotonic()
+        imported = 0
+        file = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            records = read_records(file, input_format)
+            position = 0
+            while True:
+                batch = []
+                for line, record in itertools.islice(records, options['batch_size']):
+                    position += 1
+                    batch.append(parse_recipe(record, line or position + 1))
+                if not batch:
+                    break
+                with transaction.atomic():
+                    load(user, batch)
+                imported += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'{imported} recipes imported ({imported / max(elapsed, 1e-6):.0f}/s)'
+                )
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        bump_user_version(user.pk)
+        self.stdout.write(self.style.SUCCESS(
+            f'imported {imported} recipes in {time.monotonic() - started:.1f}s'
+        ))
+
+    def load_orm(self, user, batch):
+        """load a batch through the ORM on databases without COPY"""
+        recipes = insert_objects(Recipe, [
+            Recipe(user=user, **{
+                key: value for key, value in recipe.items()
+                if key not in ('tags', 'ingredients')
+            })
+            for recipe in batch
+        ], 1000)
+        for key, field, model in RELATIONS:
+            ids = model.objects.get_or_create_names(
+                user, [name for recipe in batch for name in recipe[key]]
+            )
+            m2m = Recipe._meta.get_field(field)
+            through = m2m.remote_field.through
+            source = f'{m2m.m2m_field_name()}_id'
+            target = f'{m2m.m2m_reverse_field_name()}_id'
+            through.objects.bulk_create([
+                through(**{source: obj.pk, target: ids[name]})
+                for obj, recipe in zip(recipes, batch)
+                for name in dict.fromkeys(recipe[key])
+            ], batch_size=1000)
+
+    def load_postgresql(self, user, batch):
+        """copy a batch into staging tables and merge it with set based statements"""
+        recipe_table = Recipe._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE IF NOT EXISTS import_recipe ('
+                ' seq integer PRIMARY KEY, id integer, title varchar(255),'
+                ' time_minutes integer, price numeric(5, 2), link varchar(255)'
+                ') ON COMMIT DELETE ROWS'
+            )
+            # the rows of the previous batch are still there while the import
+            # runs in an outer transaction
+            cursor.execute('TRUNCATE import_recipe')
+            rows = io.StringIO()
+            writer = csv.writer(rows)
+            for seq, recipe in enumerate(batch):
+                writer.writerow([
+                    seq, recipe['title'], recipe['time_minutes'], recipe['price'], recipe['link'],
+                ])
+            rows.seek(0)
+            cursor.copy_expert(
+                'COPY import_recipe (seq, title, time_minutes, price, link) '
+                'FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (link))', rows
+            )
+            # allocate the ids up front so the links can be inserted by seq
+            cursor.execute(
+                'UPDATE import_recipe SET id = nextval(pg_get_serial_sequence(%s, %s))',
+                [recipe_table, 'id'],
+            )
+            cursor.execute(
+                f'INSERT INTO {recipe_table} (id, user_id, title, time_minutes, price, link,'
+                f' image, image_status, image_sha256, updated_at)'
+                f" SELECT id, %s, title, time_minutes, price, link, '', '', '', now()"
+                f' FROM import_recipe',
+                [user.pk],
+            )
+            for key, field, model in RELATIONS:
+                self.merge_related(cursor, user, batch, key, field, model)
+            cursor.execute('SELECT id FROM import_recipe')
+            update_search_vectors(row[0] for row in cursor.fetchall())
+
+    def merge_related(self, cursor, user, batch, key, field, model):
+        """create the missing named objects of user and link them by name"""
+        staging = f'import_recipe_{field}'
+        table = model._meta.db_table
+        m2m = Recipe._meta.get_field(field)
+        through = m2m.remote_field.through._meta.db_table
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ('
+            f' seq integer, name varchar(255)'
+            f') ON COMMIT DELETE ROWS'
+        )
+        cursor.execute(f'TRUNCATE {staging}')
+        rows = io.StringIO()
+        writer = csv.writer(rows)
+        for seq, recipe in enumerate(batch):
+            for name in recipe[key]:
+                writer.writerow([seq, name])
+        rows.seek(0)
+        cursor.copy_expert(f'COPY {staging} (seq, name) FROM STDIN WITH (FORMAT csv)', rows)
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, name, updated_at)'
+            f' SELECT DISTINCT %s, name, now() FROM {staging}'
+            f' ON CONFLICT (user_id, name) DO NOTHING',
+            [user.pk],
+        )
+        cursor.execute(
+            f'INSERT INTO {through} ({m2m.m2m_column_name()}, {m2m.m2m_reverse_name()})'
+            f' SELECT DISTINCT r.id, t.id FROM {staging} AS s'
+            f' JOIN import_recipe AS r ON r.seq = s.seq'
+            f' JOIN {table} AS t ON t.user_id = %s AND t.name = s.name',
+            [user.pk],
+        )
@@ -0,0 +1,76 @@
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.authentication import get_user_token
+
+
+class Command(BaseCommand):
+    """Django command to load test a running server at growing concurrency
+
+    run it once against the WSGI server and once against the ASGI one, e.g.
+
+        gunicorn app.wsgi:application -c gunicorn.conf.py
+        gunicorn app.asgi:application -c gunicorn_asgi.conf.py
+
+    with the same database, to compare how their throughput and latency
+    hold up as more clients wait on it
+    """
+    help = 'request an API path of a running server with growing numbers of clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='base url of the server, e.g. http://localhost:8000')
+        parser.add_argument('--path', default='/api/recipe/recipes/')
+        parser.add_argument('--email', required=True, help='user the requests authenticate as')
+        parser.add_argument(
+            '--concurrency', default='1,8,32,128',
+            help='comma separated numbers of concurrent clients',
+        )
+        parser.add_argument('--duration', type=float, default=10, help='seconds per level')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['email'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user with email {options["email"]}')
+        self.url = options['url'].rstrip('/') + options['path']
+        self.headers = {'Authorization': f'Token {get_user_token(user)}'}
+        for clients in (int(value) for value in options['concurrency'].split(',')):
+            self.report(clients, *self.run(clients, options['duration']))
+
+    def client(self, deadline):
+        """request the url until deadline, return latencies and error count"""
+        latencies = []
+        errors = 0
+        while time.monotonic() < deadline:
+            request = urllib.request.Request(self.url, headers=self.headers)
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+        return latencies, errors
+
+    def run(self, clients, duration):
+        started = time.monotonic()
+        with ThreadPoolExecutor(clients) as executor:
+            results = list(executor.map(self.client, [started + duration] * clients))
+        elapsed = time.monotonic() - started
+        latencies = sorted(latency for result, _errors in results for latency in result)
+        return elapsed, latencies, sum(errors for _result, errors in results)
+
+    def report(self, clients, elapsed, latencies, errors):
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'{clients} clients: every request failed'))
+            return
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{clients} clients: {len(latencies) / elapsed:.0f} requests/s,'
+            f' median {statistics.median(latencies):.1f}ms, p95 {p95:.1f}ms, {errors} errors'
+        ))
@@ -0,0 +1,44 @@
+import time
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.caching import bump_user_version
+from core.images import process_pending_images
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+    """Django command to process queued recipe images outside the web workers"""
+    help = 'process recipe images waiting in the pending state'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='keep polling for new images instead of exiting when the queue is empty',
+        )
+        parser.add_argument('--interval', type=float, default=5.0)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--requeue-processing', action='store_true',
+            help='requeue images left processing by a crashed worker, '
+                 'only use when no other worker is running',
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue_processing']:
+            processing = Recipe.objects.filter(image_status=Recipe.IMAGE_PROCESSING)
+            user_ids = list(processing.values_list('user_id', flat=True))
+            requeued = processing.update(
+                image_status=Recipe.IMAGE_PENDING, updated_at=timezone.now()
+            )
+            bump_user_version(*user_ids)
+            self.stdout.write(f'{requeued} images requeued')
+
+        while True:
+            processed = process_pending_images(limit=options['batch_size'])
+            if processed:
+                self.stdout.write(f'{processed} images processed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('image queue empty'))
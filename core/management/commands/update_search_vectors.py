@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Recipe
+from core.search import search_enabled, update_search_vectors
+
+
+class Command(BaseCommand):
+    """Django command to rebuild the search vectors of every recipe
+
+    needed after changing SEARCH_CONFIG, writes keep the vectors up to date
+    otherwise
+    """
+    help = 'recompute the full text search vectors of all recipes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not search_enabled():
+            raise CommandError('full text search needs a PostgreSQL database')
+        batch_size = options['batch_size']
+        ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+        for start in range(0, len(ids), batch_size):
+            update_search_vectors(ids[start:start + batch_size])
+        self.stdout.write(self.style.SUCCESS(f'{len(ids)} recipes updated'))
@@ -1,19 +1,77 @@
+import random
 import time
-from django.db import connections
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+
+
+def probe(connection):
+    """run a query on connection, raising OperationalError if the database is down"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+
+
+def pending_migrations(connection):
+    """return the migrations not applied to the database of connection"""
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
 
 
 class Command (BaseCommand):
-    """Django command to pause execution untl database is available"""
+    """Django command to pause execution until the database answers queries
 
-    def handle(self,*args,**options):
+    retries with exponential backoff and jitter, so containers starting
+    together neither wait longer than needed nor probe in lockstep
+    """
+    help = 'wait until the database accepts queries, and optionally is migrated'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            '--timeout', type=float, default=60,
+            help='seconds to wait before failing',
+        )
+        parser.add_argument('--initial-delay', type=float, default=0.1)
+        parser.add_argument('--max-delay', type=float, default=5)
+        parser.add_argument(
+            '--check-migrations', action='store_true',
+            help='also wait until every migration is applied, e.g. by another container',
+        )
+
+    def handle(self, *args, **options):
         self.stdout.write("waiting for database ...")
-        db_conn = None
-        while not db_conn:
+        connection = connections[options['database']]
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
             try:
-                db_conn = connections['default']
-            except OperationalError:
-                self.stdout.write('database is unavailable, waiting 1 second...')
-                time.sleep(1)
-        self.stdout.write(self.style.SUCCESS('database available!'))
+                probe(connection)
+                if not options['check_migrations']:
+                    break
+                pending = pending_migrations(connection)
+                if not pending:
+                    break
+                reason = f'{len(pending)} migrations not applied'
+            except OperationalError as error:
+                # drop the broken connection so the next attempt reconnects
+                connection.close()
+                reason = str(error).strip().split('\n')[0] or 'unavailable'
+
+            elapsed = time.monotonic() - started
+            delay = min(options['max_delay'], options['initial_delay'] * 2 ** (attempt - 1))
+            # jittered between half and all of the delay, which still doubles
+            delay = random.uniform(delay / 2, delay)
+            if elapsed + delay > options['timeout']:
+                raise CommandError(
+                    f'database not ready after {elapsed:.1f}s and {attempt} attempts: {reason}'
+                )
+            self.stdout.write(f'database not ready ({reason}), retrying in {delay:.2f}s...')
+            time.sleep(delay)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'database available after {elapsed:.2f}s and {attempt} attempts!'
+        ))
@@ -0,0 +1,143 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+
+SERVE_PYTHON = 'python'
+SERVE_X_ACCEL_REDIRECT = 'x-accel-redirect'
+SERVE_X_SENDFILE = 'x-sendfile'
+
+# one year, the longest lifetime caches are asked to honour
+IMMUTABLE_MAX_AGE = 31536000
+# images named after their content, and their renditions
+CONTENT_NAME = re.compile(r'[0-9a-f]{64}(_[0-9]+w)?')
+RANGE = re.compile(r'bytes=([0-9]*)-([0-9]*)')
+
+
+def is_content_name(name):
+    """return True if the stored file name is derived from its content"""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    return CONTENT_NAME.fullmatch(stem) is not None
+
+
+def file_etag(stat):
+    return '"%x-%x"' % (stat.st_mtime_ns, stat.st_size)
+
+
+def parse_range(header, size):
+    """return the (start, end) byte positions of a single range header
+
+    None means the whole file is sent, multiple ranges are not supported
+    and are answered with the whole file as the specification allows,
+    ValueError means the range cannot be satisfied
+    """
+    match = RANGE.fullmatch(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # the last bytes of the file
+        length = int(last)
+        if not length:
+            raise ValueError(header)
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+class RangeFile:
+    """a file object limited to length bytes from its current position"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def accelerated_response(name, path):
+    """return an empty response telling the front web server to send the file"""
+    response = HttpResponse(
+        content_type=mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    )
+    if settings.MEDIA_SERVE_MODE == SERVE_X_ACCEL_REDIRECT:
+        response['X-Accel-Redirect'] = quote(settings.MEDIA_ACCEL_PREFIX + name)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def file_response(request, path, stat):
+    """return the file at path, honouring conditional and range requests"""
+    etag = file_etag(stat)
+    mtime = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if response is not None:
+        return response
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    range_applies = (
+        if_range is None or if_range == etag or parse_http_date_safe(if_range) == mtime
+    )
+    if 'HTTP_RANGE' in request.META and range_applies:
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return response
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    file = open(path, 'rb')
+    if byte_range is None:
+        # served with wsgi.file_wrapper, i.e. sendfile, where the server has it
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(RangeFile(file, end - start + 1), status=206,
+                                content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    return response
+
+
+def media_response(request, storage, name, immutable=False):
+    """return a response delivering a stored file
+
+    depending on MEDIA_SERVE_MODE the file is sent by the front web server
+    or streamed from python, immutable files are cached for a year
+    """
+    path = storage.path(name)
+    stat = os.stat(path)
+    if settings.MEDIA_SERVE_MODE in (SERVE_X_ACCEL_REDIRECT, SERVE_X_SENDFILE):
+        response = accelerated_response(name, path)
+    else:
+        response = file_response(request, path, stat)
+    response['Accept-Ranges'] = 'bytes'
+    if immutable:
+        patch_cache_control(response, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, no_cache=True)
+    return response
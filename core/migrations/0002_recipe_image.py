@@ -0,0 +1,19 @@
+# Generated by Django 3.1.14 on 2026-10-18 09:12
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, upload_to=core.models.recipe_image_file_patch),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_recipe_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_ingredient_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'name', 'id'], name='core_tag_user_name_idx'),
+        ),
+        # the auto created through tables only index (recipe_id, tag_id), add
+        # the reverse order for the tag and ingredient recipe filters
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_tag_tag_recipe_idx ON core_recipe_tag (tag_id, recipe_id)',
+            'DROP INDEX core_recipe_tag_tag_recipe_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX core_recipe_ingredient_ingredient_recipe_idx '
+            'ON core_recipe_ingredient (ingredient_id, recipe_id)',
+            'DROP INDEX core_recipe_ingredient_ingredient_recipe_idx',
+        ),
+    ]
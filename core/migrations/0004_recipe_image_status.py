@@ -0,0 +1,29 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:08
+
+from django.db import migrations, models
+
+
+def mark_existing_images_ready(apps, schema_editor):
+    """images uploaded before background processing are served as they are"""
+    Recipe = apps.get_model('core', 'Recipe')
+    Recipe.objects.exclude(image='').exclude(image=None).update(image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_user_scoped_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], max_length=10),
+        ),
+        migrations.RunPython(mark_existing_images_ready, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(condition=models.Q(image_status='pending'), fields=['id'], name='core_recipe_image_pending_idx'),
+        ),
+    ]
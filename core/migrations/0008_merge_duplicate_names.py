@@ -0,0 +1,41 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:28
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """link recipes to the oldest of the tags or ingredients sharing a name"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field in (('Tag', 'tag'), ('Ingredient', 'ingredient')):
+        model = apps.get_model('core', model_name)
+        through = Recipe._meta.get_field(field).remote_field.through
+        duplicates = (
+            model.objects.values('user_id', 'name')
+            .annotate(keep=Min('id'), count=Count('id')).filter(count__gt=1)
+        )
+        for duplicate in duplicates:
+            others = model.objects.filter(
+                user_id=duplicate['user_id'], name=duplicate['name']
+            ).exclude(id=duplicate['keep'])
+            for other in others.values_list('id', flat=True):
+                linked = through.objects.filter(**{f'{field}_id': duplicate['keep']})
+                through.objects.filter(**{
+                    f'{field}_id': other,
+                    'recipe_id__in': linked.values('recipe_id'),
+                }).delete()
+                through.objects.filter(**{f'{field}_id': other}).update(
+                    **{f'{field}_id': duplicate['keep']}
+                )
+            others.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
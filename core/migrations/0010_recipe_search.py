@@ -0,0 +1,57 @@
+# Generated by Django 3.1.14 on 2026-10-18 04:33
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+
+# the indexes use PostgreSQL access methods, so they are created here rather
+# than declared on the models, other databases search without them
+SEARCH_INDEXES = (
+    ('core_recipe_search_idx', 'core_recipe', 'gin (search_vector)'),
+    ('core_recipe_title_trgm_idx', 'core_recipe', 'gin (title gin_trgm_ops)'),
+    ('core_tag_name_trgm_idx', 'core_tag', 'gin (name gin_trgm_ops)'),
+    ('core_ingredient_name_trgm_idx', 'core_ingredient', 'gin (name gin_trgm_ops)'),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, method in SEARCH_INDEXES:
+        schema_editor.execute(f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING {method}')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table, _method in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def fill_search_vectors(apps, schema_editor):
+    from core.search import update_search_vectors
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Recipe = apps.get_model('core', 'Recipe')
+    ids = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(ids), 10000):
+        update_search_vectors(ids[start:start + 10000], schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_unique_names'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 3.1.14 on 2026-10-18 05:02
+
+from django.db import migrations
+
+
+# istartswith compares UPPER(name::text) with LIKE, which only a pattern_ops
+# index on that expression serves, Django 3.1 cannot declare one on a model
+PREFIX_INDEXES = (
+    ('core_tag_user_prefix_idx', 'core_tag'),
+    ('core_ingredient_user_prefix_idx', 'core_ingredient'),
+)
+
+
+def create_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table in PREFIX_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} (user_id, upper(name::text) text_pattern_ops)'
+        )
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _table in PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_recipe_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
@@ -1,4 +1,6 @@
-from django.db import models
+from django.contrib.postgres.search import SearchVectorField, TrigramSimilarity
+from django.db import connections, models
+from django.utils import timezone
 from django.contrib.auth.models import AbstractBaseUser , BaseUserManager , PermissionsMixin
 from django.conf import settings
 import uuid
@@ -11,6 +13,16 @@ def recipe_image_file_patch(instance,filename):
     filename = f'{uuid.uuid4()}.{ext}'
     return os.path.join('media/img/recipe/',filename)
 
+
+def recipe_image_content_patch(sha256,ext):
+    """generate file path for a recipe image named after its content"""
+    return os.path.join('media/img/recipe/',f'{sha256}.{ext}')
+
+
+def image_upload_file_patch(upload_id):
+    """generate file path for the partial data of an image upload"""
+    return os.path.join('media/img/recipe/uploads/',f'{upload_id}.part')
+
 class UserManager(BaseUserManager):
 
     def create_user (self,email,password=None,**extra_fields):
@@ -45,6 +57,68 @@ class User(AbstractBaseUser,PermissionsMixin):
     USERNAME_FIELD = 'email'
 
 
+class NamedObjectManager(models.Manager):
+
+    def get_or_create_names(self,user,names):
+        """return the ids of the objects of user with the given names by name,
+        creating the missing ones
+
+        on PostgreSQL this is a single INSERT ... ON CONFLICT DO NOTHING
+        RETURNING statement, the (user, name) constraint keeps concurrent
+        calls from creating duplicates
+        """
+        names = list(dict.fromkeys(names))
+        if not names:
+            return {}
+        connection = connections[self.db]
+        if connection.vendor == 'postgresql':
+            table = connection.ops.quote_name(self.model._meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'WITH input (name) AS (SELECT unnest(%s::varchar[])),'
+                    f' inserted AS ('
+                    f'  INSERT INTO {table} (user_id, name, updated_at)'
+                    f'  SELECT %s, name, %s FROM input'
+                    f'  ON CONFLICT (user_id, name) DO NOTHING RETURNING name, id'
+                    f' )'
+                    f' SELECT name, id FROM inserted'
+                    f' UNION ALL SELECT t.name, t.id FROM {table} AS t'
+                    f' JOIN input USING (name) WHERE t.user_id = %s',
+                    [names,user.pk,timezone.now(),user.pk]
+                )
+                ids = dict(cursor.fetchall())
+        else:
+            self.bulk_create([self.model(user=user,name=name) for name in names],
+                             ignore_conflicts=True)
+            ids = {}
+        missing = [name for name in names if name not in ids]
+        if missing:
+            # also rows committed by a concurrent call after the statement started
+            ids.update(self.filter(user=user,name__in=missing).values_list('name','id'))
+        return ids
+
+    def autocomplete(self,user,text,limit):
+        """return up to limit objects of user as dicts of id and name, the
+        names starting with text first, then on PostgreSQL the names most
+        similar to it
+
+        the prefix lookup is a range scan of the (user, upper(name)) index
+        of migration 0011, the similarity one uses the trigram index of 0010
+        """
+        objects = self.filter(user=user)
+        found = list(
+            objects.filter(name__istartswith=text).order_by('name','id').values('id','name')[:limit]
+        )
+        # shorter texts have no trigram in common with most names
+        if len(found) < limit and len(text) >= 3 and connections[self.db].vendor == 'postgresql':
+            found += objects.filter(name__trigram_similar=text).exclude(
+                id__in=[obj['id'] for obj in found]
+            ).annotate(similarity=TrigramSimilarity('name',text)).order_by(
+                '-similarity','name','id'
+            ).values('id','name')[:limit - len(found)]
+        return found
+
+
 class Tag(models.Model):
     """Tag to be used for a recipe"""
     name = models.CharField(max_length=255)
@@ -53,6 +127,19 @@ class Tag(models.Model):
     on_delete = models.CASCADE
     )
 
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = NamedObjectManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='core_tag_user_name_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'], name='core_tag_user_name_idx'),
+            models.Index(fields=['user', 'updated_at'], name='core_tag_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -65,12 +152,36 @@ class Ingredient(models.Model):
     on_delete = models.CASCADE
     )
 
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = NamedObjectManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='core_ingredient_user_name_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'name', 'id'], name='core_ingredient_user_name_idx'),
+            models.Index(fields=['user', 'updated_at'], name='core_ingredient_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
 class Recipe(models.Model):
     """recipe object"""
+    IMAGE_PENDING = 'pending'
+    IMAGE_PROCESSING = 'processing'
+    IMAGE_READY = 'ready'
+    IMAGE_FAILED = 'failed'
+    IMAGE_STATUS_CHOICES = (
+        (IMAGE_PENDING, 'Pending'),
+        (IMAGE_PROCESSING, 'Processing'),
+        (IMAGE_READY, 'Ready'),
+        (IMAGE_FAILED, 'Failed'),
+    )
+
     title = models.CharField(max_length=255)
     user = models.ForeignKey(
     settings.AUTH_USER_MODEL,
@@ -81,8 +192,45 @@ class Recipe(models.Model):
     ingredient = models.ManyToManyField('Ingredient')
     tag = models.ManyToManyField('Tag')
     link = models.CharField(max_length=255,blank=True)
-    image = models.ImageField(null=True,upload_to=recipe_image_file_patch)
-
+    image = models.ImageField(null=True,upload_to=recipe_image_file_patch,db_index=True)
+    image_status = models.CharField(max_length=10,choices=IMAGE_STATUS_CHOICES,blank=True)
+    image_sha256 = models.CharField(max_length=64,blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # title, tag and ingredient names, kept up to date by core.search on
+    # PostgreSQL, where migration 0010 indexes it
+    search_vector = SearchVectorField(null=True,editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='core_recipe_user_id_idx'),
+            models.Index(fields=['user', 'updated_at'], name='core_recipe_updated_idx'),
+            # range filters and ordering=, ending in id for the keyset pagination
+            models.Index(fields=['user', 'time_minutes', 'id'], name='core_recipe_user_time_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='core_recipe_user_price_idx'),
+            # pending images are the queue polled by core.images
+            models.Index(
+                fields=['id'],
+                name='core_recipe_image_pending_idx',
+                condition=models.Q(image_status='pending'),
+            ),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ImageUpload(models.Model):
+    """resumable upload of a recipe image sent in several chunks"""
+    id = models.UUIDField(primary_key=True,default=uuid.uuid4,editable=False)
+    recipe = models.ForeignKey('Recipe',on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    size = models.PositiveIntegerField()
+    offset = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True,db_index=True)
+
+    @property
+    def partial_name(self):
+        return image_upload_file_patch(self.id)
+
+    def __str__(self):
+        return f'{self.file_name} ({self.offset}/{self.size})'
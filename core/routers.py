@@ -0,0 +1,99 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+
+# set while a view may read from the replicas, a context variable so it
+# follows the request across threads and coroutines
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin_to_primary(user_id):
+    """read the data of a user from the primary for REPLICA_PIN_SECONDS, so
+    the user sees their own writes before the replicas catch up, the pin is
+    kept in the default cache, which settings requires to be shared"""
+    cache.set(pin_key(user_id), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(pin_key(user_id)) is not None
+
+
+@contextmanager
+def primary_reads():
+    """read from the primary in the block, even in a view reading from replicas
+
+    for reads stored in the response cache, a replica behind a write made
+    outside of a request, e.g. by a command, would have its old data cached
+    under the version the write bumped
+    """
+    token = replica_reads.set(False)
+    try:
+        yield
+    finally:
+        replica_reads.reset(token)
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    """send the reads of views marked by ReplicaReadMixin to a random replica
+
+    everything else, writes included, goes to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        if settings.DATABASE_REPLICAS and replica_reads.get():
+            return choose_replica()
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # also for objects read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReplicaReadMixin:
+    """read from the replicas in the safe requests of replica_actions
+
+    authentication and permission checks still read from the primary, and
+    users who wrote in the last REPLICA_PIN_SECONDS read from it too
+    """
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (settings.DATABASE_REPLICAS and request.method in SAFE_METHODS
+                and getattr(self, 'action', None) in self.replica_actions
+                and not is_pinned(request.user.pk)):
+            self.replica_token = replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'replica_token', None)
+        if token is not None:
+            replica_reads.reset(token)
+            self.replica_token = None
+        if (settings.DATABASE_REPLICAS and request.method not in SAFE_METHODS
+                and request.user.is_authenticated):
+            pin_to_primary(request.user.pk)
+        return super().finalize_response(request, response, *args, **kwargs)
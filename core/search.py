@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.db import connections
+from core.models import Recipe
+
+
+def search_enabled(using='default'):
+    """return True if the database keeps full text search vectors"""
+    return connections[using].vendor == 'postgresql'
+
+
+def update_search_vectors(recipe_ids, using='default'):
+    """recompute the search vectors of the given recipes in one statement
+
+    the title weighs most, then the tag names and the ingredient names, on
+    databases without full text search this does nothing
+    """
+    if not search_enabled(using):
+        return
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    parts = ["setweight(to_tsvector(%s::regconfig, r.title), 'A')"]
+    for field, weight in (('tag', 'B'), ('ingredient', 'C')):
+        m2m = Recipe._meta.get_field(field)
+        table = quote(m2m.related_model._meta.db_table)
+        through = quote(m2m.remote_field.through._meta.db_table)
+        parts.append(
+            f'setweight(to_tsvector(%s::regconfig, coalesce(('
+            f' SELECT string_agg(t.name, \' \') FROM {through} AS l'
+            f' JOIN {table} AS t ON t.id = l.{quote(m2m.m2m_reverse_name())}'
+            f' WHERE l.{quote(m2m.m2m_column_name())} = r.id'
+            f"), '')), '{weight}')"
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {quote(Recipe._meta.db_table)} AS r'
+            f' SET search_vector = {" || ".join(parts)}'
+            f' WHERE r.id = ANY(%s)',
+            [settings.SEARCH_CONFIG] * len(parts) + [recipe_ids],
+        )
@@ -0,0 +1,165 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from core.authentication import invalidate_tokens, token_cache, user_token_cache_key
+from core.caching import bump_user_version
+from core.db import check_connections, mark_checked
+from core.images import release_image
+from core.models import ImageUpload, Ingredient, Recipe, Tag
+from core.search import search_enabled, update_search_vectors
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """drop a changed or deleted token from the token cache once committed
+
+    dropped any earlier, a concurrent request could cache the old row again
+    """
+    key = instance.key
+    user_cache_key = user_token_cache_key(instance.user_id)
+
+    def invalidate():
+        invalidate_tokens(key)
+        token_cache().delete(user_cache_key)
+
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """drop the tokens of a changed user, e.g. deactivated or new password"""
+    if created:
+        # the id may have belonged to a deleted user on some databases
+        bump_user_version(instance.pk)
+        return
+    keys = list(Token.objects.filter(user=instance).values_list('key', flat=True))
+    transaction.on_commit(lambda: invalidate_tokens(*keys))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """delete the image of a deleted recipe unless another recipe shares it"""
+    if instance.image:
+        name = instance.image.name
+        storage = instance.image.storage
+        transaction.on_commit(lambda: release_image(storage, name))
+
+
+@receiver(post_delete, sender=ImageUpload)
+def delete_partial_upload(sender, instance, **kwargs):
+    """delete the partial data of a finished, expired or cascade deleted upload"""
+    storage = Recipe._meta.get_field('image').storage
+    name = instance.partial_name
+    transaction.on_commit(lambda: storage.delete(name))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_user_responses(sender, instance, **kwargs):
+    """drop the cached lists of the owner of a changed object"""
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def invalidate_linked_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    """drop the cached lists of a user when recipes are linked or unlinked
+
+    the recipes are touched as well, their updated_at covers their links
+    """
+    if reverse and action == 'pre_clear':
+        # the recipes are only known before the links are gone
+        related_name = 'tag' if isinstance(instance, Tag) else 'ingredient'
+        touch_recipes(Recipe.objects.filter(**{related_name: instance}))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        touch_recipes(Recipe.objects.filter(pk=instance.pk))
+    elif pk_set:
+        touch_recipes(Recipe.objects.filter(pk__in=pk_set))
+    bump_user_version(instance.user_id)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def touch_linked_recipes(sender, instance, **kwargs):
+    """touch the recipes losing a deleted tag or ingredient"""
+    related_name = 'tag' if sender is Tag else 'ingredient'
+    touch_recipes(Recipe.objects.filter(**{related_name: instance}))
+
+
+def touch_recipes(recipes):
+    recipes.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Recipe)
+def update_recipe_search_vector(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'title' in update_fields:
+        update_search_vectors([instance.pk])
+
+
+@receiver(m2m_changed, sender=Recipe.tag.through)
+@receiver(m2m_changed, sender=Recipe.ingredient.through)
+def update_linked_search_vectors(sender, instance, action, reverse, pk_set, **kwargs):
+    """update the search vectors of recipes gaining or losing names"""
+    if not search_enabled():
+        return
+    if reverse and action == 'pre_clear':
+        related_name = 'tag' if isinstance(instance, Tag) else 'ingredient'
+        update_recipes_on_commit(Recipe.objects.filter(**{related_name: instance}))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        update_search_vectors([instance.pk])
+    elif pk_set:
+        update_search_vectors(pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_renamed_search_vectors(sender, instance, created, **kwargs):
+    """update the search vectors of the recipes of a renamed tag or ingredient"""
+    if created or not search_enabled():
+        return
+    related_name = 'tag' if sender is Tag else 'ingredient'
+    update_search_vectors(
+        Recipe.objects.filter(**{related_name: instance}).values_list('pk', flat=True)
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def update_unlinked_search_vectors(sender, instance, **kwargs):
+    """update the search vectors of the recipes losing a deleted tag or ingredient"""
+    if not search_enabled():
+        return
+    related_name = 'tag' if sender is Tag else 'ingredient'
+    update_recipes_on_commit(Recipe.objects.filter(**{related_name: instance}))
+
+
+def update_recipes_on_commit(recipes):
+    """update the search vectors of recipes once their links are gone"""
+    ids = list(recipes.values_list('pk', flat=True))
+    if ids:
+        transaction.on_commit(lambda: update_search_vectors(ids))
+
+
+@receiver(connection_created)
+def mark_new_connection_checked(sender, connection, **kwargs):
+    mark_checked(connection)
+
+
+@receiver(request_started)
+def check_persistent_connections(sender, **kwargs):
+    """replace persistent database connections dropped by the server"""
+    check_connections()
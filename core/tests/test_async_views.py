@@ -0,0 +1,117 @@
+import asyncio
+import gc
+import json
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.exceptions import SynchronousOnlyOperation
+from django.core.handlers.asgi import ASGIHandler
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIRequestFactory, force_authenticate
+from core import async_views
+from core.async_views import StreamingASGIHandler, async_read_view
+from core.models import Recipe, Tag
+from recipe.views import RecipeViewSet, TagViewSet
+
+
+def tearDownModule():
+    # the connections of the pool threads go with them, the test database
+    # cannot be dropped while they are open
+    if async_views._read_executor is not None:
+        async_views._read_executor.shutdown()
+        gc.collect()
+        async_views._read_executor = None
+
+
+class AsyncReadViewTests(TransactionTestCase):
+    """test serving viewsets through the async wrapper"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.factory = APIRequestFactory()
+
+    def call(self, view, request, **kwargs):
+        force_authenticate(request, user=self.user)
+        return async_to_sync(view)(request, **kwargs)
+
+    def test_wrapped_view_is_async(self):
+        """test Django sees the wrapper as an async view"""
+        view = async_read_view(TagViewSet.as_view({'get': 'list'}))
+
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(view.csrf_exempt)
+
+    def test_list_and_retrieve(self):
+        """test reads are answered from the pool with rendered responses"""
+        recipe = Recipe.objects.create(user=self.user, title='soup', time_minutes=5, price=5)
+        list_view = async_read_view(RecipeViewSet.as_view({'get': 'list'}))
+        detail_view = async_read_view(RecipeViewSet.as_view({'get': 'retrieve'}))
+
+        res = self.call(list_view, self.factory.get('/'))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([item['id'] for item in res.data['results']], [recipe.id])
+        self.assertTrue(res.is_rendered)
+
+        res = self.call(detail_view, self.factory.get('/'), pk=recipe.id)
+        self.assertEqual(res.data['title'], 'soup')
+
+    def test_write(self):
+        """test writes still go through the wrapper"""
+        view = async_read_view(TagViewSet.as_view({'get': 'list', 'post': 'create'}))
+
+        res = self.call(view, self.factory.post('/', {'name': 'vegan'}))
+
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(Tag.objects.filter(user=self.user, name='vegan').exists())
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class StreamingASGIHandlerTests(TransactionTestCase):
+    """test streaming responses reading the database under ASGI"""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.token = Token.objects.create(user=user)
+        for title in ('soup', 'stew', 'salad'):
+            Recipe.objects.create(user=user, title=title, time_minutes=5, price=5)
+
+    def request(self, application):
+        """return the status and body of an export served by application"""
+        scope = {
+            'type': 'http',
+            'method': 'GET',
+            'path': reverse('recipe:recipe-export'),
+            'query_string': b'',
+            'headers': [
+                (b'host', b'localhost'),
+                (b'authorization', f'Token {self.token.key}'.encode()),
+            ],
+        }
+
+        async def serve():
+            communicator = ApplicationCommunicator(application, scope)
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(5)
+            body = b''
+            while True:
+                message = await communicator.receive_output(5)
+                body += message.get('body', b'')
+                if not message.get('more_body'):
+                    return start['status'], body
+
+        return async_to_sync(serve)()
+
+    def test_export_streamed(self):
+        """test the export is read from the database off the event loop"""
+        status, body = self.request(StreamingASGIHandler())
+
+        self.assertEqual(status, 200)
+        titles = [json.loads(line)['title'] for line in body.decode().splitlines()]
+        self.assertEqual(titles, ['soup', 'stew', 'salad'])
+
+    def test_export_fails_in_event_loop(self):
+        """test Django's own handler cannot send the export"""
+        with self.assertRaises(SynchronousOnlyOperation):
+            self.request(ASGIHandler())
@@ -0,0 +1,83 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from core.authentication import CachedTokenAuthentication, token_cache, token_cache_key
+
+
+@override_settings(TOKEN_CACHE_ENABLED=True)
+class CachedTokenAuthenticationTests(TransactionTestCase):
+    """test the caching token authentication class"""
+
+    def setUp(self):
+        token_cache().clear()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'test123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_authenticate_cached(self):
+        """test a second authentication does not query the database"""
+        user, token = self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(cached_user, self.user)
+        self.assertEqual(cached_token.key, token.key)
+
+    def test_invalid_token(self):
+        """test unknown tokens are rejected"""
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials('invalid')
+
+    def test_deleted_token_rejected(self):
+        """test a cached token stops working once deleted"""
+        key = self.token.key
+        self.auth.authenticate_credentials(key)
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(key)
+
+    def test_token_dropped_on_commit(self):
+        """test a deleted token stays cached until its transaction commits"""
+        self.auth.authenticate_credentials(self.token.key)
+        cache_key = token_cache_key(self.token.key)
+
+        with transaction.atomic():
+            self.token.delete()
+            self.assertIsNotNone(token_cache().get(cache_key))
+
+        self.assertIsNone(token_cache().get(cache_key))
+
+    def test_deactivated_user_rejected(self):
+        """test a cached token stops working once the user is deactivated"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_changed_user_reloaded(self):
+        """test changes to the user are seen by the next request"""
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.name = 'new name'
+        self.user.save()
+
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user.name, 'new name')
+
+    @override_settings(TOKEN_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """test every authentication is checked against the database without a shared cache"""
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+
+        self.assertEqual(user, self.user)
@@ -0,0 +1,19 @@
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from core.checks import check_webp_support
+
+
+class WebpCheckTests(SimpleTestCase):
+    """test the system check of the image formats Pillow supports"""
+
+    def test_webp_supported(self):
+        """test no error is reported when Pillow handles webp"""
+        with patch('core.checks.features.check', return_value=True):
+            self.assertEqual(check_webp_support(None), [])
+
+    def test_webp_missing(self):
+        """test an error is reported when Pillow was built without webp"""
+        with patch('core.checks.features.check', return_value=False):
+            errors = check_webp_support(None)
+
+        self.assertEqual([error.id for error in errors], ['core.E001'])
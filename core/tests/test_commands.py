@@ -1,22 +1,166 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from unittest.mock import patch
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from core.models import Tag, Ingredient, Recipe
 
 
-class CommandTests(TestCase):
+@patch('core.management.commands.wait_for_db.probe')
+class WaitForDbCommandTests(SimpleTestCase):
 
-    def test_wait_for_db_ready (self):
+    def test_wait_for_db_ready (self,probe):
         """test waiting for db when db is ready"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.return_value = True
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count,1)
+        out = StringIO()
+        call_command('wait_for_db',stdout=out)
+        self.assertEqual(probe.call_count,1)
+        self.assertIn('database available after',out.getvalue())
+
+    @patch('time.sleep',return_value=True)
+    def test_wait_for_db(self,ts,probe):
+        """test waiting for db with growing delays"""
+        probe.side_effect = [OperationalError] * 5 + [None]
+        call_command('wait_for_db',stdout=StringIO())
+        self.assertEqual(probe.call_count,6)
+        delays = [call.args[0] for call in ts.call_args_list]
+        self.assertEqual(len(delays),5)
+        self.assertLess(delays[0],delays[-1])
+
+    @patch('time.sleep',return_value=True)
+    @patch('time.monotonic',side_effect=range(0,1000,10))
+    def test_wait_for_db_timeout(self,monotonic,ts,probe):
+        """test giving up once the timeout is reached"""
+        probe.side_effect = OperationalError('connection refused')
+        with self.assertRaises(CommandError):
+            call_command('wait_for_db',timeout=30,stdout=StringIO())
 
     @patch('time.sleep',return_value=True)
-    def test_wait_for_db(self,ts):
-        """test waiting for db"""
-        with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command('wait_for_db')
-            self.assertEqual(gi.call_count,6)
+    @patch('core.management.commands.wait_for_db.pending_migrations')
+    def test_wait_for_db_migrations(self,pending,ts,probe):
+        """test waiting until the migrations are applied"""
+        pending.side_effect = [['0001_initial'], []]
+        call_command('wait_for_db',check_migrations=True,stdout=StringIO())
+        self.assertEqual(pending.call_count,2)
+
+
+class CommandTests(TestCase):
+
+    def test_explain_queries(self):
+        """test explaining the viewset queries of a user"""
+        get_user_model().objects.create_user('test@gmail.com', 'test123')
+        out = StringIO()
+        call_command('explain_queries', email='test@gmail.com', stdout=out)
+        self.assertIn('recipes', out.getvalue())
+
+    def test_explain_queries_no_user(self):
+        """test explaining queries fails without users"""
+        with self.assertRaises(CommandError):
+            call_command('explain_queries', stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DedupeImagesCommandTests(TestCase):
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def test_dedupe_images(self):
+        """test duplicate images stored under random names are merged"""
+        output = BytesIO()
+        Image.new('RGB', (10, 10)).save(output, format='PNG')
+        user = get_user_model().objects.create_user('test@gmail.com', 'test123')
+        recipes = [
+            Recipe.objects.create(
+                user=user, title=f'recipe{i}', time_minutes=5, price=5,
+                image=SimpleUploadedFile('image.png', output.getvalue()),
+            )
+            for i in range(2)
+        ]
+        out = StringIO()
+
+        call_command('dedupe_images', stdout=out)
+
+        names = {recipe.image.name for recipe in Recipe.objects.all()}
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names.pop().endswith('.png'))
+        self.assertFalse(any(os.path.exists(recipe.image.path) for recipe in recipes))
+        self.assertIn(f'saved {len(output.getvalue())} bytes', out.getvalue())
+
+
+class ImportRecipesCommandTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'test123')
+        self.tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.tempdir, name)
+        with open(path, 'w') as file:
+            file.write(content)
+        return path
+
+    def test_import_ndjson(self):
+        """test recipes are imported with tags deduplicated by name"""
+        Tag.objects.create(user=self.user, name='vegan')
+        path = self.write('recipes.ndjson', (
+            '{"title": "soup", "time_minutes": 5, "price": "4.50", "tags": ["vegan", "hot"],'
+            ' "ingredients": ["salt"]}\n'
+            '{"title": "salad", "time_minutes": 3, "price": 3, "tags": ["vegan"]}\n'
+        ))
+        out = StringIO()
+
+        call_command('import_recipes', path, email='test@gmail.com', batch_size=1, stdout=out)
+
+        soup = Recipe.objects.get(user=self.user, title='soup')
+        self.assertEqual(str(soup.price), '4.50')
+        self.assertEqual(sorted(tag.name for tag in soup.tag.all()), ['hot', 'vegan'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        salad = Recipe.objects.get(user=self.user, title='salad')
+        self.assertEqual(salad.tag.get(), soup.tag.get(name='vegan'))
+        self.assertIn('2 recipes imported', out.getvalue())
+
+    def test_import_csv(self):
+        """test recipes exported as csv are imported"""
+        path = self.write('recipes.csv', (
+            'id,title,time_minutes,price,link,tags,ingredients\n'
+            '1,soup,5,4.50,,vegan|hot,salt\n'
+        ))
+
+        call_command('import_recipes', path, email='test@gmail.com', stdout=StringIO())
+
+        soup = Recipe.objects.get(user=self.user)
+        self.assertEqual(soup.tag.count(), 2)
+        self.assertEqual(soup.ingredient.get().name, 'salt')
+
+    def test_import_csv_json_names(self):
+        """test names exported as json lists keep the separator character"""
+        path = self.write('recipes.csv', (
+            'id,title,time_minutes,price,link,tags,ingredients\n'
+            '1,soup,5,4.50,,"[""salt|pepper"", ""hot""]",[]\n'
+        ))
+
+        call_command('import_recipes', path, email='test@gmail.com', stdout=StringIO())
+
+        soup = Recipe.objects.get(user=self.user)
+        self.assertEqual(sorted(tag.name for tag in soup.tag.all()), ['hot', 'salt|pepper'])
+        self.assertFalse(soup.ingredient.exists())
+
+    def test_import_invalid_row(self):
+        """test invalid rows stop the import with their line number"""
+        path = self.write('recipes.ndjson', '{"title": "soup", "time_minutes": "x", "price": 1}\n')
+
+        with self.assertRaisesMessage(CommandError, 'line 1'):
+            call_command('import_recipes', path, email='test@gmail.com', stdout=StringIO())
+        self.assertFalse(Recipe.objects.exists())
@@ -0,0 +1,60 @@
+from unittest.mock import Mock, patch
+from django.test import SimpleTestCase, override_settings
+from core.db import check_connections
+
+
+def sample_connection(usable=True, checked_at=None):
+    """create a stand in for an open database connection"""
+    connection = Mock(in_atomic_block=False, health_checked_at=checked_at)
+    connection.is_usable.return_value = usable
+    return connection
+
+
+@override_settings(DB_CONN_HEALTH_CHECKS=True, DB_HEALTH_CHECK_INTERVAL=10)
+class CheckConnectionsTests(SimpleTestCase):
+
+    def check(self, *connections):
+        with patch('core.db.connections') as handler, patch('time.monotonic', return_value=100):
+            handler.all.return_value = connections
+            check_connections()
+
+    def test_dead_connection_closed(self):
+        """test a connection the server dropped is closed"""
+        connection = sample_connection(usable=False)
+        self.check(connection)
+
+        connection.close.assert_called_once_with()
+
+    def test_usable_connection_kept(self):
+        """test a working connection stays open and is marked as checked"""
+        connection = sample_connection()
+        self.check(connection)
+
+        connection.close.assert_not_called()
+        self.assertEqual(connection.health_checked_at, 100)
+
+    def test_recently_checked_connection_skipped(self):
+        """test connections are checked at most once per interval"""
+        connection = sample_connection(checked_at=95)
+        self.check(connection)
+
+        connection.is_usable.assert_not_called()
+
+    def test_closed_and_atomic_connections_skipped(self):
+        """test closed connections and open transactions are left alone"""
+        closed = sample_connection()
+        closed.connection = None
+        atomic = sample_connection()
+        atomic.in_atomic_block = True
+        self.check(closed, atomic)
+
+        closed.is_usable.assert_not_called()
+        atomic.is_usable.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_health_checks_disabled(self):
+        """test nothing is checked when health checks are off"""
+        connection = sample_connection()
+        self.check(connection)
+
+        connection.is_usable.assert_not_called()
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO
+from unittest import skipUnless
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from core import images
+from core.models import Recipe, recipe_image_content_patch
+from core.uploads import store_image
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def image_file(size=(10, 10), fmt='JPEG', **save_options):
+    """return an uploaded image file of the given size"""
+    output = BytesIO()
+    Image.new('RGB', size).save(output, format=fmt, **save_options)
+    return SimpleUploadedFile(f'image.{fmt.lower()}', output.getvalue())
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_MAX_SIZE=100)
+class ProcessImageTests(TestCase):
+    """test background processing of recipe images"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        user = get_user_model().objects.create_user('test@gmail.com', 'test123')
+        self.recipe = Recipe.objects.create(user=user, title='test', time_minutes=5, price=5)
+
+    def upload(self, file):
+        self.recipe.image = file
+        self.recipe.save()
+        images.enqueue_image(self.recipe)
+
+    def test_image_resized_and_stripped(self):
+        """test large images are shrunk and lose their metadata"""
+        exif = Image.Exif()
+        exif[0x010f] = 'camera'
+        self.upload(image_file((400, 200), exif=exif.tobytes()))
+        name = self.recipe.image.name
+
+        self.assertTrue(images.process_image(self.recipe.id))
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(self.recipe.image.name, name)
+        leftovers = os.listdir(os.path.dirname(self.recipe.image.path))
+        self.assertFalse([file for file in leftovers if file.endswith('.tmp')])
+        with Image.open(self.recipe.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn(0x010f, image.getexif())
+
+    def test_invalid_image_failed(self):
+        """test files that are not images are marked failed"""
+        self.upload(SimpleUploadedFile('image.jpg', b'not an image'))
+
+        with self.assertLogs('core.images', 'WARNING'):
+            images.process_image(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_unsupported_format_failed(self):
+        """test images in formats outside the accepted ones are not converted"""
+        self.upload(image_file(fmt='BMP'))
+
+        with self.assertLogs('core.images', 'WARNING'):
+            images.process_image(self.recipe.id)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_FAILED)
+
+    def test_image_claimed_once(self):
+        """test an image is only processed by one worker"""
+        self.upload(image_file())
+
+        self.assertTrue(images.process_image(self.recipe.id))
+        self.assertFalse(images.process_image(self.recipe.id))
+
+    def test_process_pending_images(self):
+        """test the queue is drained in one pass"""
+        self.upload(image_file())
+
+        self.assertEqual(images.process_pending_images(), 1)
+        self.assertEqual(images.process_pending_images(), 0)
+
+    def test_stalled_images_requeued(self):
+        """test images left processing by a killed worker are processed on start"""
+        self.upload(image_file())
+        Recipe.objects.filter(pk=self.recipe.pk).update(
+            image_status=Recipe.IMAGE_PROCESSING,
+            updated_at=timezone.now() - timedelta(hours=1),
+        )
+        recent = Recipe.objects.create(
+            user=self.recipe.user, title='other', time_minutes=5, price=5,
+            image=image_file(), image_status=Recipe.IMAGE_PROCESSING,
+        )
+
+        self.assertEqual(images.requeue_stalled_images(), 1)
+        self.assertEqual(images.process_pending_images(), 1)
+
+        self.recipe.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual(self.recipe.image_status, Recipe.IMAGE_READY)
+        self.assertEqual(recent.image_status, Recipe.IMAGE_PROCESSING)
+
+    def test_shared_image_processed_once(self):
+        """test recipes sharing an image are settled by one processing run"""
+        self.upload(image_file((400, 200)))
+        other = Recipe.objects.create(
+            user=self.recipe.user, title='other', time_minutes=5, price=5,
+            image=self.recipe.image.name,
+        )
+        images.enqueue_image(other)
+
+        self.assertEqual(images.process_pending_images(), 1)
+
+        other.refresh_from_db()
+        self.assertEqual(other.image_status, Recipe.IMAGE_READY)
+
+    def test_upload_of_processed_image_ready(self):
+        """test a recipe reusing a processed image skips the queue"""
+        self.upload(image_file())
+        images.process_image(self.recipe.id)
+        other = Recipe.objects.create(
+            user=self.recipe.user, title='other', time_minutes=5, price=5,
+            image=self.recipe.image.name,
+        )
+
+        images.enqueue_image(other)
+
+        self.assertEqual(other.image_status, Recipe.IMAGE_READY)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ReleaseImageTests(TransactionTestCase):
+    """test stored images are deleted with the last recipe using them"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'test123')
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='test', time_minutes=5, price=5, image=image_file(),
+        )
+        self.other = Recipe.objects.create(
+            user=self.user, title='other', time_minutes=5, price=5,
+            image=self.recipe.image.name,
+        )
+
+    def test_image_kept_while_referenced(self):
+        """test deleting one of the recipes sharing an image keeps the file"""
+        storage = self.recipe.image.storage
+        name = self.recipe.image.name
+        rendition = images.get_rendition(self.recipe, 320, 'webp')
+
+        self.recipe.delete()
+        self.assertTrue(storage.exists(name))
+
+        self.other.delete()
+        self.assertFalse(storage.exists(name))
+        self.assertFalse(storage.exists(rendition))
+
+    @skipUnless(connection.vendor == 'postgresql', 'names are only locked on PostgreSQL')
+    def test_release_waits_for_reuse(self):
+        """test a file reused by an upload is not deleted before it is referenced"""
+        storage = self.recipe.image.storage
+        data = image_file().read()
+        sha256 = hashlib.sha256(data).hexdigest()
+        name = storage.save(recipe_image_content_patch(sha256, 'jpg'), ContentFile(data))
+        temp_name = storage.save('media/img/recipe/upload.jpg', ContentFile(data))
+        freed = []
+
+        def release():
+            freed.append(images.release_image(storage, name))
+            connection.close()
+
+        with transaction.atomic():
+            self.assertEqual(store_image(storage, temp_name, sha256, 'JPEG'), name)
+            thread = threading.Thread(target=release)
+            thread.start()
+            thread.join(0.5)
+            self.assertTrue(thread.is_alive())
+            Recipe.objects.filter(pk=self.other.pk).update(image=name)
+        thread.join()
+
+        self.assertEqual(freed, [0])
+        self.assertTrue(storage.exists(name))
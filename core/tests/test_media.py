@@ -0,0 +1,126 @@
+import os
+import shutil
+import tempfile
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from core.models import Recipe
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+SHA256 = 'a' * 64
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_SERVE_MODE='python')
+class ServeMediaTests(TestCase):
+    """test serving uploaded files"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.name = default_storage.save(f'media/img/recipe/{SHA256}.jpg', ContentFile(b'0123456789'))
+        self.url = f'/{self.name}'
+
+    def tearDown(self):
+        default_storage.delete(self.name)
+
+    def test_serve_file(self):
+        """test files are served with validators"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b''.join(res.streaming_content), b'0123456789')
+        self.assertEqual(res['Content-Type'], 'image/jpeg')
+        self.assertEqual(res['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', res)
+        self.assertIn('Last-Modified', res)
+        self.assertIn('no-cache', res['Cache-Control'])
+
+    def test_not_modified(self):
+        """test conditional requests for unchanged files get a 304"""
+        etag = self.client.get(self.url)['ETag']
+
+        res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range(self):
+        """test a byte range of a file is served"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2-4')
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b''.join(res.streaming_content), b'234')
+        self.assertEqual(res['Content-Range'], 'bytes 2-4/10')
+        self.assertEqual(res['Content-Length'], '3')
+
+    def test_suffix_range(self):
+        """test the last bytes of a file are served"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=-3')
+
+        self.assertEqual(b''.join(res.streaming_content), b'789')
+
+    def test_range_not_satisfiable(self):
+        """test ranges past the end of the file are refused"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=20-')
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range(self):
+        """test the whole file is sent when it changed since the range was read"""
+        res = self.client.get(self.url, HTTP_RANGE='bytes=2-4', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+
+    def test_ready_content_named_image_immutable(self):
+        """test processed images named by content are cached for good"""
+        user = get_user_model().objects.create_user('test@gmail.com', 'test123')
+        Recipe.objects.create(
+            user=user, title='test', time_minutes=5, price=5,
+            image=self.name, image_status=Recipe.IMAGE_READY,
+        )
+
+        res = self.client.get(self.url)
+
+        self.assertIn('immutable', res['Cache-Control'])
+        self.assertIn('max-age=31536000', res['Cache-Control'])
+
+    @override_settings(MEDIA_SERVE_MODE='x-accel-redirect', MEDIA_ACCEL_PREFIX='/protected/')
+    def test_x_accel_redirect(self):
+        """test delivery is handed to nginx"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res['X-Accel-Redirect'], f'/protected/{self.name}')
+        self.assertEqual(res.content, b'')
+
+    @override_settings(MEDIA_SERVE_MODE='x-sendfile')
+    def test_x_sendfile(self):
+        """test delivery is handed to the web server by path"""
+        res = self.client.get(self.url)
+
+        self.assertEqual(res['X-Sendfile'], os.path.join(MEDIA_ROOT, self.name))
+
+    def test_missing_file(self):
+        """test missing files and partial uploads are not found"""
+        self.assertEqual(self.client.get('/media/img/recipe/missing.jpg').status_code, 404)
+        default_storage.save('media/img/recipe/uploads/x.part', ContentFile(b'data'))
+        self.assertEqual(self.client.get('/media/img/recipe/uploads/x.part').status_code, 404)
+
+    def test_outside_recipe_images(self):
+        """test paths leaving the recipe image directory are not found"""
+        default_storage.save('app/settings.py', ContentFile(b'SECRET_KEY'))
+        default_storage.save('media/other.txt', ContentFile(b'data'))
+        for url in (
+            '/media/../app/settings.py',
+            '/media/..%2fapp/settings.py',
+            '/media/img/recipe/..%2f..%2f..%2fapp/settings.py',
+            '/media/img/recipe/uploads/..%2f..%2f..%2f..%2fapp/settings.py',
+            '/media/other.txt',
+            '/media/img/recipe/uploads/../uploads/x.part',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
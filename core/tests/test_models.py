@@ -79,4 +79,16 @@ class ModelTests(TestCase):
         file_patch = models.recipe_image_file_patch(None,'myimage.jpg')
 
         exp_patch = f'media/img/recipe/{uuid}.jpg'
-        self.assertEqual(file_patch,exp_patch)
\ No newline at end of file
+        self.assertEqual(file_patch,exp_patch)
+
+    def test_get_or_create_names(self):
+        """test named objects are reused per user and missing ones created"""
+        user = sample_user()
+        vegan = models.Tag.objects.create(user=user,name='vegan')
+        models.Tag.objects.create(user=sample_user('other@gmail.com'),name='dessert')
+
+        ids = models.Tag.objects.get_or_create_names(user,['vegan','dessert','vegan'])
+
+        self.assertEqual(ids['vegan'],vegan.id)
+        self.assertEqual(models.Tag.objects.get(pk=ids['dessert']).user,user)
+        self.assertEqual(models.Tag.objects.filter(user=user).count(),2)
@@ -0,0 +1,130 @@
+import os
+import runpy
+from unittest.mock import patch
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag
+from core.routers import ReplicaRouter, replica_reads
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2'])
+class ReplicaRouterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.router = ReplicaRouter()
+
+    def test_reads_default_outside_views(self):
+        """test reads go to the primary unless a view allows replicas"""
+        self.assertEqual(self.router.db_for_read(Recipe), 'default')
+
+    def test_reads_replica_in_views(self):
+        """test reads go to one of the replicas when allowed"""
+        token = replica_reads.set(True)
+        try:
+            self.assertIn(self.router.db_for_read(Recipe), ('replica1', 'replica2'))
+        finally:
+            replica_reads.reset(token)
+
+    def test_writes_default(self):
+        """test writes always go to the primary"""
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_write(Recipe), 'default')
+        finally:
+            replica_reads.reset(token)
+
+    def test_replicas_not_migrated(self):
+        """test migrations only run on the primary"""
+        self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+@patch('core.routers.choose_replica', return_value='default')
+class ReplicaReadTests(TestCase):
+    """test the recipe API reads from replicas with read your writes"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_reads_replica(self, choose_replica):
+        """test lists are read from a replica"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(choose_replica.called)
+        self.assertFalse(replica_reads.get())
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_cached_list_reads_primary(self, choose_replica):
+        """test lists stored in the response cache are read from the primary"""
+        res = self.client.get(RECIPE_URL)
+        autocomplete = self.client.get(reverse('recipe:tag-autocomplete'), {'q': 'veg'})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(autocomplete['X-Cache'], 'MISS')
+        choose_replica.assert_not_called()
+
+    def test_write_reads_primary(self, choose_replica):
+        """test writes never read from a replica"""
+        res = self.client.post(TAGS_URL, {'name': 'vegan'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        choose_replica.assert_not_called()
+
+    def test_reads_pinned_after_write(self, choose_replica):
+        """test a user reads from the primary right after writing"""
+        self.client.post(TAGS_URL, {'name': 'vegan'})
+        self.client.get(TAGS_URL)
+
+        choose_replica.assert_not_called()
+
+    def test_pin_per_user(self, choose_replica):
+        """test writes only pin the user who wrote"""
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass123')
+        Tag.objects.create(user=other, name='vegan')
+        self.client.post(TAGS_URL, {'name': 'vegan'})
+        self.client.force_authenticate(other)
+
+        self.client.get(TAGS_URL)
+
+        self.assertTrue(choose_replica.called)
+
+
+class ReplicaSettingsTests(SimpleTestCase):
+    """test replicas are only configured with a cache shared by the workers"""
+
+    def load_settings(self, **environ):
+        with patch.dict(os.environ, environ):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, 'app', 'settings.py'))
+
+    def test_per_process_cache_refused(self):
+        """test the pins cannot live in a cache private to each worker"""
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings(
+                DB_REPLICAS='replica-host',
+                CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache',
+            )
+
+    def test_shared_cache(self):
+        """test replicas are set up with a shared cache"""
+        values = self.load_settings(
+            DB_REPLICAS='replica-host/replica',
+            CACHE_BACKEND='django.core.cache.backends.db.DatabaseCache',
+        )
+
+        self.assertEqual(values['DATABASE_REPLICAS'], ['replica1'])
+        self.assertEqual(values['DATABASES']['replica1']['HOST'], 'replica-host')
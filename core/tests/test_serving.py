@@ -0,0 +1,32 @@
+import os
+from unittest.mock import patch
+from django.test import SimpleTestCase
+from app import serving
+
+
+class WorkerCountTests(SimpleTestCase):
+    """test sizing the gunicorn workers"""
+
+    @patch.dict(os.environ, {'WEB_CONCURRENCY': '', 'WORKER_MEMORY_MB': '100'})
+    @patch('app.serving.cpu_count', return_value=4)
+    def test_workers_per_cpu(self, _cpu_count):
+        """test the workers follow the cpus when memory is plentiful"""
+        with patch('app.serving.memory_bytes', return_value=64 << 30):
+            self.assertEqual(serving.worker_count(per_cpu=2, extra=1), 9)
+            self.assertEqual(serving.worker_count(per_cpu=1), 4)
+        with patch('app.serving.memory_bytes', return_value=None):
+            self.assertEqual(serving.worker_count(per_cpu=2, extra=1), 9)
+
+    @patch.dict(os.environ, {'WEB_CONCURRENCY': '', 'WORKER_MEMORY_MB': '100'})
+    @patch('app.serving.cpu_count', return_value=4)
+    def test_workers_capped_by_memory(self, _cpu_count):
+        """test no more workers start than fit in memory, and at least one"""
+        with patch('app.serving.memory_bytes', return_value=500 << 20):
+            self.assertEqual(serving.worker_count(per_cpu=2, extra=1), 4)
+        with patch('app.serving.memory_bytes', return_value=50 << 20):
+            self.assertEqual(serving.worker_count(per_cpu=2, extra=1), 1)
+
+    @patch.dict(os.environ, {'WEB_CONCURRENCY': '6'})
+    def test_web_concurrency(self):
+        """test WEB_CONCURRENCY overrides the count"""
+        self.assertEqual(serving.worker_count(per_cpu=2, extra=1), 6)
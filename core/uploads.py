@@ -0,0 +1,274 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+from io import BytesIO
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import (
+    FileUploadHandler, SkipFile, StopFutureHandlers, StopUpload,
+)
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.datastructures import MultiValueDict
+from django.utils.translation import gettext_lazy as _
+from PIL import Image
+from rest_framework import status
+from core.db import advisory_lock
+from core.models import ImageUpload, image_upload_file_patch, recipe_image_content_patch
+
+
+# room for the multipart boundaries and headers around the image
+MULTIPART_OVERHEAD = 64 * 1024
+# give up identifying an image after this many bytes
+MAX_HEADER_BYTES = 1024 * 1024
+# file extensions of stored images by pillow format, images in any other
+# format are rejected before pillow decodes them
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+class ImageRejected(Exception):
+    """the uploaded data is not an acceptable image"""
+
+    def __init__(self, message, status_code=status.HTTP_400_BAD_REQUEST):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def check_image_format(fmt):
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ImageRejected(_('Upload a JPEG, PNG, WebP or GIF image.'))
+
+
+def check_image_size(width, height, max_pixels):
+    if width * height > max_pixels:
+        raise ImageRejected(
+            _('image is larger than %(max)s pixels') % {'max': max_pixels},
+            status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+
+def check_image_file(path, max_pixels):
+    """check the dimensions and structure of a stored image without decoding it
+
+    return the pillow format of the image
+    """
+    try:
+        with Image.open(path) as image:
+            check_image_format(image.format)
+            check_image_size(image.width, image.height, max_pixels)
+            image.verify()
+            return image.format
+    except Image.DecompressionBombError:
+        raise ImageRejected(_('image is too large'), status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    except (OSError, SyntaxError, ValueError):
+        raise ImageRejected(_('Upload a valid image.'))
+
+
+class ImageProbe:
+    """read the dimensions of an image from the first chunks of its data"""
+
+    def __init__(self, max_pixels):
+        self.max_pixels = max_pixels
+        self.header = BytesIO()
+        self.size = None
+
+    def feed(self, data):
+        if self.size is not None:
+            return
+        self.header.write(data)
+        self.header.seek(0)
+        try:
+            with Image.open(self.header) as image:
+                fmt = image.format
+                self.size = image.size
+        except Image.DecompressionBombError:
+            raise ImageRejected(_('image is too large'), status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except Exception:
+            if self.header.getbuffer().nbytes > MAX_HEADER_BYTES:
+                raise ImageRejected(_('Upload a valid image.'))
+            self.header.seek(0, os.SEEK_END)
+            return
+        self.header = None
+        check_image_format(fmt)
+        check_image_size(*self.size, self.max_pixels)
+
+
+def store_image(storage, temp_name, sha256, fmt):
+    """move a received image to the name derived from its content, return the name
+
+    identical images map to the same name, so when it already exists the
+    received copy is dropped instead of being stored twice. Call it in the
+    transaction attaching the image, the name stays locked until it commits
+    so release_image cannot delete the file before it is referenced
+    """
+    name = recipe_image_content_patch(sha256, FORMAT_EXTENSIONS[fmt])
+    advisory_lock(name)
+    path = storage.path(name)
+    if os.path.exists(path):
+        storage.delete(temp_name)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(storage.path(temp_name), path)
+    return name
+
+
+class StoredImageFile(UploadedFile):
+    """an uploaded image already written to a temporary name in storage"""
+
+    def __init__(self, storage_name, size, content_type, sha256):
+        super().__init__(None, storage_name, content_type, size)
+        self.storage_name = storage_name
+        self.sha256 = sha256
+
+
+class StreamingImageUploadHandler(FileUploadHandler):
+    """write an uploaded image straight to storage, next to its final location
+
+    the byte size and the pixel count are checked as the data arrives, so
+    oversized uploads are rejected before they are buffered, and a sha256
+    of the content is computed on the way
+    """
+
+    def __init__(self, request, storage, field_name, max_bytes, max_pixels):
+        super().__init__(request)
+        self.storage = storage
+        self.image_field_name = field_name
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.error = None
+        self.path = None
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_bytes + MULTIPART_OVERHEAD:
+            self.error = ImageRejected(
+                _('image is larger than %(max)s bytes') % {'max': self.max_bytes},
+                status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+            # skip parsing, the body is never read
+            return QueryDict(), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        if field_name != self.image_field_name or self.path is not None:
+            raise SkipFile()
+        self.name = image_upload_file_patch(uuid.uuid4())
+        self.path = self.storage.path(self.name)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'xb')
+        self.sha256 = hashlib.sha256()
+        self.probe = ImageProbe(self.max_pixels)
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        try:
+            if start + len(raw_data) > self.max_bytes:
+                raise ImageRejected(
+                    _('image is larger than %(max)s bytes') % {'max': self.max_bytes},
+                    status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                )
+            self.probe.feed(raw_data)
+        except ImageRejected as error:
+            self.reject(error)
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.close()
+        if self.probe.size is None:
+            self.reject(ImageRejected(_('Upload a valid image.')))
+        return StoredImageFile(self.name, file_size, self.content_type, self.sha256.hexdigest())
+
+    def reject(self, error):
+        """drop the partial file and stop reading the upload"""
+        self.error = error
+        self.discard()
+        raise StopUpload(connection_reset=False)
+
+    def discard(self):
+        """remove the stored file, e.g. when the request fails validation"""
+        if self.path is not None:
+            self.file.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def probe_partial_file(path, max_pixels):
+    """check the dimensions of a partially received image once its header is in"""
+    with open(path, 'rb') as file:
+        ImageProbe(max_pixels).feed(file.read(MAX_HEADER_BYTES + 1))
+
+
+def receive_chunk(stream, length, path):
+    """read up to length bytes from stream into a file next to path, return its path
+
+    the body is read before the upload is locked, so a slow client does not
+    hold it while it sends. The file is removed if the body cannot be read
+    """
+    fd, chunk_path = tempfile.mkstemp(suffix='.chunk', dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            remaining = length
+            while remaining:
+                data = stream.read(min(CHUNK_SIZE, remaining))
+                if not data:
+                    break
+                file.write(data)
+                remaining -= len(data)
+    except BaseException:
+        os.remove(chunk_path)
+        raise
+    return chunk_path
+
+
+def append_chunk(upload, chunk_path, path, max_pixels):
+    """append a received chunk to the partial file of upload
+
+    data past the recorded offset, left by an interrupted request, is
+    overwritten so that a client can always resume from the offset
+    """
+    start = upload.offset
+    with open(path, 'r+b') as file, open(chunk_path, 'rb') as chunk:
+        file.truncate(start)
+        file.seek(start)
+        shutil.copyfileobj(chunk, file, CHUNK_SIZE)
+        upload.offset = file.tell()
+    if start <= MAX_HEADER_BYTES:
+        probe_partial_file(path, max_pixels)
+    upload.save(update_fields=['offset'])
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(CHUNK_SIZE), b''):
+            sha256.update(data)
+    return sha256.hexdigest()
+
+
+def finish_upload(upload, storage, max_pixels):
+    """move a completely received upload to its final name, return (name, sha256)
+
+    the partial file is renamed in place, so the data is never copied
+    """
+    partial = storage.path(upload.partial_name)
+    fmt = check_image_file(partial, max_pixels)
+    sha256 = file_sha256(partial)
+    return store_image(storage, upload.partial_name, sha256, fmt), sha256
+
+
+def expire_uploads():
+    """delete the uploads left unfinished for RECIPE_IMAGE_UPLOAD_EXPIRY seconds
+
+    their partial data is deleted by core.signals, return how many expired
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.RECIPE_IMAGE_UPLOAD_EXPIRY)
+    _total, deleted = ImageUpload.objects.filter(created__lt=cutoff).delete()
+    return deleted.get(ImageUpload._meta.label, 0)
@@ -0,0 +1,46 @@
+import os
+import posixpath
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import Http404
+from django.views.decorators.http import require_safe
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from core.authentication import CachedTokenAuthentication
+from core.caching import cache_stats
+from core.media import is_content_name, media_response
+from core.models import Recipe
+
+
+RECIPE_IMAGE_DIR = 'media/img/recipe'
+
+
+@require_safe
+def serve_media(request, path):
+    """serve an uploaded file, replacing the debug only static() view"""
+    if '..' in path.split('/'):
+        raise Http404
+    name = posixpath.normpath(f'media/{path}')
+    # only recipe images and their renditions, not the partial data of
+    # uploads in progress below uploads/
+    if posixpath.dirname(name) != RECIPE_IMAGE_DIR:
+        raise Http404
+    try:
+        if not os.path.isfile(default_storage.path(name)):
+            raise Http404
+    except SuspiciousFileOperation:
+        raise Http404
+    # content named images are rewritten once when they are processed
+    immutable = is_content_name(name) and Recipe.objects.filter(
+        image=name, image_status=Recipe.IMAGE_READY
+    ).exists()
+    return media_response(request, default_storage, name, immutable=immutable)
+
+
+@api_view(['GET'])
+@authentication_classes((CachedTokenAuthentication,))
+@permission_classes((IsAdminUser,))
+def response_cache_stats(request):
+    """return the hit and miss counts of the cached list responses"""
+    return Response(cache_stats())
@@ -0,0 +1,53 @@
+"""gunicorn settings serving app.wsgi in production
+
+    gunicorn app.wsgi:application
+
+picked up from the working directory, sized from the cpus and memory of
+the container: 2 processes per cpu plus one, as many as WORKER_MEMORY_MB
+each fit in memory, with GUNICORN_THREADS threads each to keep the cpus
+busy while requests wait on the database. every thread may hold one of
+the persistent connections, keep workers * threads below max_connections
+
+kill -HUP the master to reload the settings and replace the workers
+gracefully. the code is preloaded in the master, to deploy new code send
+USR2 to start a new master next to the old one, then QUIT the old one
+"""
+import os
+from app.serving import cpu_count, memory_bytes, worker_count
+
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+worker_class = 'gthread'
+workers = worker_count(per_cpu=2, extra=1)
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# recycle workers now and then, staggered so they do not restart together
+max_requests = int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('WORKER_TIMEOUT', 30))
+# time given to the requests in flight when workers are replaced
+graceful_timeout = int(os.environ.get('GRACEFUL_TIMEOUT', 30))
+# longer than the idle timeout of a load balancer in front, 60s on most
+keepalive = int(os.environ.get('KEEPALIVE', 75))
+backlog = 2048
+# import the project once and fork the workers from it, they share its
+# memory copy on write
+preload_app = True
+accesslog = os.environ.get('ACCESS_LOG', '-') or None
+
+
+def when_ready(server):
+    # the workers must open their own connections, not share the master's
+    from django.db import connections
+    connections.close_all()
+    memory = memory_bytes()
+    server.log.info(
+        'serving with %s workers of %s threads on %s cpus, %s MB memory',
+        workers, threads, cpu_count(), memory // (1024 * 1024) if memory else 'unknown',
+    )
+
+
+def post_worker_init(worker):
+    # pick up the images queued while no worker was processing them
+    from core.images import start_workers
+    start_workers()
@@ -0,0 +1,38 @@
+"""gunicorn settings serving app.asgi with uvicorn workers
+
+    gunicorn app.asgi:application -c gunicorn_asgi.conf.py
+
+one event loop per cpu is enough, as many as fit in memory, reads wait on
+the database from the ASYNC_READ_THREADS pool of each worker instead of
+occupying a process, and so do streaming responses like the recipe export
+"""
+import os
+from app.serving import worker_count
+
+
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+worker_class = 'uvicorn.workers.UvicornWorker'
+workers = worker_count(per_cpu=1)
+
+raw_env = [
+    'ASYNC_READ_VIEWS=1',
+    f"ASYNC_READ_THREADS={os.environ.get('ASYNC_READ_THREADS', 10)}",
+]
+
+# recycle workers now and then, staggered so they do not restart together
+max_requests = int(os.environ.get('MAX_REQUESTS', 10000))
+max_requests_jitter = max_requests // 10
+timeout = int(os.environ.get('WORKER_TIMEOUT', 30))
+graceful_timeout = 30
+# longer than the idle timeout of a load balancer in front, 60s on most
+keepalive = int(os.environ.get('KEEPALIVE', 75))
+backlog = 2048
+# import the project once and fork the workers from it
+preload_app = True
+accesslog = os.environ.get('ACCESS_LOG', '-') or None
+
+
+def post_worker_init(worker):
+    # pick up the images queued while no worker was processing them
+    from core.images import start_workers
+    start_workers()
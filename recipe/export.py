@@ -0,0 +1,95 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from core.models import Recipe
+
+
+EXPORT_NDJSON = 'ndjson'
+EXPORT_CSV = 'csv'
+EXPORT_FORMATS = {
+    EXPORT_NDJSON: 'application/x-ndjson',
+    EXPORT_CSV: 'text/csv',
+}
+
+EXPORT_FIELDS = ('id', 'title', 'time_minutes', 'price', 'link')
+# separator of the tag and ingredient names in csv cells written before they
+# were exported as json lists, still read by import_recipes
+CSV_LIST_SEPARATOR = '|'
+
+
+def related_names(field, recipe_ids):
+    """return the names linked to each of recipe_ids through field, in one query"""
+    m2m = Recipe._meta.get_field(field)
+    through = m2m.remote_field.through
+    source = m2m.m2m_field_name()
+    target = m2m.m2m_reverse_field_name()
+    names = {recipe_id: [] for recipe_id in recipe_ids}
+    rows = through.objects.filter(**{f'{source}_id__in': recipe_ids}).order_by(
+        f'{target}__name'
+    ).values_list(f'{source}_id', f'{target}__name')
+    for recipe_id, name in rows:
+        names[recipe_id].append(name)
+    return names
+
+
+def iter_recipes(queryset, chunk_size):
+    """yield lists of recipe dicts with their tag and ingredient names
+
+    rows are read through a server side cursor where the database has one,
+    and the names of each chunk are fetched with one query per relation, so
+    only one chunk is held in memory at a time
+    """
+    rows = queryset.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    chunk = []
+    for row in rows:
+        chunk.append(dict(zip(EXPORT_FIELDS, row)))
+        if len(chunk) == chunk_size:
+            yield with_related(chunk)
+            chunk = []
+    if chunk:
+        yield with_related(chunk)
+
+
+def with_related(chunk):
+    ids = [recipe['id'] for recipe in chunk]
+    tags = related_names('tag', ids)
+    ingredients = related_names('ingredient', ids)
+    for recipe in chunk:
+        recipe['tags'] = tags[recipe['id']]
+        recipe['ingredients'] = ingredients[recipe['id']]
+    return chunk
+
+
+class Echo:
+    """file like object handing back what is written to it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_ndjson(queryset, chunk_size):
+    for chunk in iter_recipes(queryset, chunk_size):
+        yield ''.join(json.dumps(recipe, cls=DjangoJSONEncoder) + '\n' for recipe in chunk)
+
+
+def stream_csv(queryset, chunk_size):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS + ('tags', 'ingredients'))
+    for chunk in iter_recipes(queryset, chunk_size):
+        yield ''.join(
+            writer.writerow(
+                # names are json lists, any character in them survives
+                [recipe[field] for field in EXPORT_FIELDS] + [
+                    json.dumps(recipe['tags']),
+                    json.dumps(recipe['ingredients']),
+                ]
+            )
+            for recipe in chunk
+        )
+
+
+def stream_export(queryset, export_format, chunk_size):
+    """return an iterator over the exported recipes of queryset"""
+    if export_format == EXPORT_CSV:
+        return stream_csv(queryset, chunk_size)
+    return stream_ndjson(queryset, chunk_size)
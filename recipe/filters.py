@@ -0,0 +1,152 @@
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db.models import Count, DecimalField, Exists, F, FloatField, OuterRef, Q, Value
+from django.db.models.functions import Cast, Coalesce
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from core.models import Recipe
+from core.search import search_enabled
+
+
+MATCH_ANY = 'any'
+MATCH_ALL = 'all'
+
+
+def params_to_ints(value, param):
+    """Convert a comma separated string of IDs to a list of integers"""
+    try:
+        return [int(str_id) for str_id in value.split(',') if str_id]
+    except ValueError:
+        raise ValidationError({param: _('expected a comma separated list of ids')})
+
+
+def filter_by_related(queryset, field, ids, match=MATCH_ANY):
+    """filter recipes linked to any or all of ids through the many to many field
+
+    the through table is queried in a subquery so the recipe rows are never
+    multiplied by a join and every recipe is returned at most once
+    """
+    through = Recipe._meta.get_field(field).remote_field.through
+    column = f'{field}_id'
+    links = through.objects.filter(**{f'{column}__in': ids})
+    if match == MATCH_ALL:
+        matched = (
+            links.values('recipe_id')
+            .annotate(matches=Count(column, distinct=True))
+            .filter(matches=len(set(ids)))
+            .values('recipe_id')
+        )
+        return queryset.filter(id__in=matched)
+    return queryset.filter(Exists(links.filter(recipe_id=OuterRef('pk'))))
+
+
+def search_recipes(queryset, text):
+    """filter recipes matching text in their title, tag or ingredient names
+
+    on PostgreSQL the words are matched against the indexed search vector,
+    and titles and names similar to the whole text match as well so typos
+    are tolerated, the recipes are annotated with a search_rank. Other
+    databases match every word as a substring, unranked.
+
+    the rank is rounded to a fixed precision numeric, the keyset pagination
+    seeks on it and a float4 would not survive the trip through the cursor
+    """
+    if not search_enabled(queryset.db):
+        for word in text.split():
+            matches = Q(title__icontains=word)
+            for field in ('tag', 'ingredient'):
+                through = Recipe._meta.get_field(field).remote_field.through
+                matches |= Q(Exists(through.objects.filter(
+                    recipe_id=OuterRef('pk'), **{f'{field}__name__icontains': word}
+                )))
+            queryset = queryset.filter(matches)
+        return queryset
+
+    query = SearchQuery(text, config=settings.SEARCH_CONFIG, search_type='websearch')
+    matches = Q(search_vector=query) | Q(title__trigram_similar=text)
+    for field in ('tag', 'ingredient'):
+        through = Recipe._meta.get_field(field).remote_field.through
+        matches |= Q(Exists(through.objects.filter(
+            recipe_id=OuterRef('pk'), **{f'{field}__name__trigram_similar': text}
+        )))
+    rank = Coalesce(
+        SearchRank(F('search_vector'), query), Value(0.0), output_field=FloatField()
+    ) + TrigramSimilarity('title', text)
+    return queryset.filter(matches).annotate(
+        search_rank=Cast(rank, DecimalField(max_digits=12, decimal_places=6))
+    )
+
+
+class RecipeFilter:
+    """filter recipes from the ?tags=, ?ingredients= and ?q= query parameters
+
+    ``tags_match`` and ``ingredients_match`` select between returning recipes
+    that have any of the given ids (the default) or all of them, ``q`` is a
+    text search. ``min_price``, ``max_price``, ``min_time_minutes`` and
+    ``max_time_minutes`` are inclusive bounds, ``ordering`` sorts by one of
+    ``ordering_fields``, descending with a leading ``-``.
+    """
+    relations = (
+        ('tags', 'tag'),
+        ('ingredients', 'ingredient'),
+    )
+    ranges = (
+        ('price', Decimal),
+        ('time_minutes', int),
+    )
+    # every one is the second column of a (user, field, id) index
+    ordering_fields = ('id', 'price', 'time_minutes')
+
+    def __init__(self, query_params):
+        self.query_params = query_params
+
+    def get_match(self, param):
+        match = self.query_params.get(f'{param}_match', MATCH_ANY)
+        if match not in (MATCH_ANY, MATCH_ALL):
+            raise ValidationError({f'{param}_match': _('expected "any" or "all"')})
+        return match
+
+    def filter_queryset(self, queryset):
+        for param, field in self.relations:
+            value = self.query_params.get(param)
+            if not value:
+                continue
+            ids = params_to_ints(value, param)
+            if ids:
+                queryset = filter_by_related(queryset, field, ids, self.get_match(param))
+        for field, parse in self.ranges:
+            for bound, lookup in (('min', 'gte'), ('max', 'lte')):
+                param = f'{bound}_{field}'
+                value = self.query_params.get(param)
+                if not value:
+                    continue
+                try:
+                    value = parse(value)
+                except (ValueError, InvalidOperation):
+                    raise ValidationError({param: _('expected a number')})
+                if isinstance(value, Decimal) and not value.is_finite():
+                    raise ValidationError({param: _('expected a number')})
+                queryset = queryset.filter(**{f'{field}__{lookup}': value})
+        text = self.query_params.get('q', '').strip()
+        if len(text) > settings.SEARCH_MAX_LENGTH:
+            raise ValidationError({'q': _('search text is too long')})
+        if text:
+            queryset = search_recipes(queryset, text)
+        return queryset
+
+    def get_ordering(self):
+        """return the requested ordering with its id tie break, None by default"""
+        value = self.query_params.get('ordering')
+        if not value:
+            return None
+        field = value.lstrip('-')
+        if field not in self.ordering_fields or value.count('-') > 1:
+            raise ValidationError({'ordering': _('expected one of %(fields)s') % {
+                'fields': ', '.join(self.ordering_fields)
+            }})
+        direction = '-' if value.startswith('-') else ''
+        if field == 'id':
+            return (value,)
+        # ties are broken in the same direction so a backward index scan serves both
+        return (value, f'{direction}id')
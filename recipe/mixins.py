@@ -0,0 +1,401 @@
+import hashlib
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import timezone
+from django.utils.http import parse_etags
+from django.utils.translation import gettext as _
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from core.caching import (
+    bump_user_version, get_user_version, record_lookup, response_cache,
+    response_cache_key,
+)
+from core.routers import primary_reads
+
+
+def make_etag(*parts):
+    """return a strong etag made of the given values"""
+    digest = hashlib.sha256('|'.join(map(str, parts)).encode('utf-8')).hexdigest()
+    return f'"{digest[:32]}"'
+
+
+def etag_matches(request, etag):
+    """return True if the If-None-Match header of request matches etag"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(header)]
+    return '*' in etags or etag in etags
+
+
+def not_modified(etag):
+    response = HttpResponseNotModified()
+    response['ETag'] = etag
+    return response
+
+
+class ConditionalMixin:
+    """answer conditional GETs of lists and objects with 304 Not Modified
+
+    list etags are computed before the list is queried, from the latest
+    updated_at and the row count of the user's objects, object etags from
+    their own updated_at and the latest one of the related objects they
+    include
+    """
+    # related objects serialized in object responses
+    etag_related_fields = ()
+
+    def get_etag_querysets(self):
+        """return the querysets the list responses are derived from"""
+        return [self.queryset.filter(user=self.request.user)]
+
+    def get_list_etag(self):
+        request = self.request
+        parts = [self.basename, request.accepted_media_type, request.build_absolute_uri()]
+        for queryset in self.get_etag_querysets():
+            values = queryset.aggregate(updated=Max('updated_at'), count=Count('id'))
+            parts += [values['updated'], values['count']]
+        return make_etag(*parts)
+
+    def object_etag(self, *values):
+        return make_etag(
+            self.basename, self.request.accepted_media_type,
+            self.request.build_absolute_uri(), *values
+        )
+
+    def get_object_etag(self):
+        """return the etag of the requested object, None if it does not exist"""
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        aggregates = {'updated': Max('updated_at')}
+        for field in self.etag_related_fields:
+            aggregates[field] = Max(f'{field}__updated_at')
+        try:
+            values = self.queryset.filter(
+                user=self.request.user, **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+            ).aggregate(**aggregates)
+        except (TypeError, ValueError, ValidationError):
+            # malformed lookups are not found, as get_object_or_404 has it
+            return None
+        if values['updated'] is None:
+            return None
+        return self.object_etag(*values.values())
+
+    def get_instance_etag(self, instance):
+        """return the etag of a loaded object, from its prefetched relations"""
+        values = [instance.updated_at]
+        for field in self.etag_related_fields:
+            related = [obj.updated_at for obj in getattr(instance, field).all()]
+            values.append(max(related, default=None))
+        return self.object_etag(*values)
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag()
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        # unconditional requests take the etag from the loaded object instead
+        # of spending a query on it
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            etag = self.get_object_etag()
+            if etag is not None and etag_matches(request, etag):
+                return not_modified(etag)
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        response['ETag'] = self.get_instance_etag(instance)
+        return response
+
+
+class CachedListMixin:
+    """cache the rendered list responses of a viewset per user and query string
+
+    cached responses belong to a version of the user, which is bumped by
+    core.signals whenever one of the user's tags, ingredients or recipes
+    changes, so stale entries are never read and simply expire. lists are
+    not cached unless RESPONSE_CACHE_ENABLED, the cached ones are read from
+    the primary
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return super().list(request, *args, **kwargs)
+        cache = response_cache()
+        version = get_user_version(request.user.pk)
+        key = response_cache_key(request, self.basename, version)
+        cached = cache.get(key)
+        record_lookup(cached is not None)
+        if cached is not None:
+            content, content_type, etag = cached
+            if etag and etag_matches(request, etag):
+                response = not_modified(etag)
+            else:
+                response = HttpResponse(content, content_type=content_type)
+                if etag:
+                    response['ETag'] = etag
+            response['X-Cache'] = 'HIT'
+            return response
+
+        with primary_reads():
+            response = super().list(request, *args, **kwargs)
+        response['X-Cache'] = 'MISS'
+        if response.status_code == 200:
+            response.add_post_render_callback(lambda rendered: cache.set(
+                key, (rendered.content, rendered['Content-Type'], rendered.get('ETag'))
+            ))
+        return response
+
+
+class AutocompleteMixin:
+    """suggest the names of the user's objects starting with or similar to ?q=
+
+    answers are small unpaginated lists, cached like the list responses
+    """
+    autocomplete_limit = 10
+    autocomplete_max_limit = 50
+
+    def get_autocomplete_limit(self):
+        try:
+            limit = int(self.request.query_params.get('limit', self.autocomplete_limit))
+        except ValueError:
+            limit = self.autocomplete_limit
+        return max(1, min(limit, self.autocomplete_max_limit))
+
+    @action(methods=['GET'], detail=False)
+    def autocomplete(self, request, *args, **kwargs):
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'q': [_('This field is required.')]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(text) > settings.SEARCH_MAX_LENGTH:
+            return Response({'q': [_('search text is too long')]},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return Response(self.get_autocomplete(text))
+        cache = response_cache()
+        version = get_user_version(request.user.pk)
+        key = response_cache_key(request, f'{self.basename}-autocomplete', version)
+        data = cache.get(key)
+        record_lookup(data is not None)
+        hit = data is not None
+        if not hit:
+            with primary_reads():
+                data = self.get_autocomplete(text)
+            cache.set(key, data)
+        response = Response(data)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        return response
+
+    def get_autocomplete(self, text):
+        return self.queryset.model.objects.autocomplete(
+            self.request.user, text, self.get_autocomplete_limit()
+        )
+
+
+def insert_objects(model, objs, batch_size):
+    """insert objs in batches and set their primary keys"""
+    if connection.features.can_return_rows_from_bulk_insert:
+        return model.objects.bulk_create(objs, batch_size=batch_size)
+    if connection.vendor == 'sqlite':
+        # sqlite serializes writers, so inside the transaction the new rows
+        # get the next ids in order
+        model.objects.bulk_create(objs, batch_size=batch_size)
+        ids = model.objects.order_by('-pk').values_list('pk', flat=True)[:len(objs)]
+        for obj, pk in zip(objs, reversed(list(ids))):
+            obj.pk = pk
+        return objs
+    for obj in objs:
+        obj.save()
+    return objs
+
+
+class BulkMixin:
+    """create, update or delete many objects of the user in one request
+
+    POST, PATCH and DELETE on the bulk route take a list of objects, or of
+    ids for DELETE, validated together. Nothing is written unless every item
+    is valid, and the errors are then returned per item like a serializer
+    with many=True would.
+    """
+    bulk_serializer_class = None
+    # many to many fields sent as lists of ids of the user's objects
+    bulk_related_fields = ()
+    # field unique among the objects of a user
+    bulk_unique_field = None
+
+    def get_bulk_queryset(self):
+        return self.queryset.filter(user=self.request.user)
+
+    @action(methods=['POST', 'PATCH', 'DELETE'], detail=False, url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': _('Expected a list of items.')},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.BULK_MAX_ITEMS:
+            return Response(
+                {'detail': _('At most %(max)s items can be sent at once.')
+                    % {'max': settings.BULK_MAX_ITEMS}},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if request.method == 'DELETE':
+            return self.bulk_destroy(items)
+
+        partial = request.method == 'PATCH'
+        serializer = self.bulk_serializer_class(data=items, many=True, partial=partial)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        validated = serializer.validated_data
+        errors = [{} for _item in validated]
+        instances = self.check_bulk_ids(validated, errors) if partial else None
+        self.check_bulk_related(validated, errors)
+        self.check_bulk_unique(validated, errors)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            if partial:
+                objs = self.bulk_update_objects(validated, instances)
+            else:
+                objs = self.bulk_create_objects(validated)
+            self.bulk_saved(objs)
+            bump_user_version(request.user.pk)
+
+        # read back in one go, with the relations the response includes
+        saved = self.get_bulk_queryset().filter(pk__in=[obj.pk for obj in objs])
+        saved = saved.prefetch_related(*self.bulk_related_fields).in_bulk()
+        data = self.get_serializer([saved[obj.pk] for obj in objs], many=True).data
+        return Response(
+            data, status=status.HTTP_200_OK if partial else status.HTTP_201_CREATED
+        )
+
+    def check_bulk_ids(self, validated, errors):
+        """return the objects to update by id, recording unknown ids"""
+        ids = [item.get('id') for item in validated]
+        instances = self.get_bulk_queryset().in_bulk([pk for pk in ids if pk is not None])
+        for error, pk in zip(errors, ids):
+            if pk is None:
+                error['id'] = [_('This field is required.')]
+            elif pk not in instances:
+                error['id'] = [_('Not found.')]
+        return instances
+
+    def check_bulk_related(self, validated, errors):
+        """record ids of related objects that are not the user's"""
+        for field in self.bulk_related_fields:
+            model = self.queryset.model._meta.get_field(field).related_model
+            ids = {pk for item in validated for pk in item.get(field, ())}
+            owned = set(
+                model.objects.filter(user=self.request.user, pk__in=ids)
+                .values_list('pk', flat=True)
+            )
+            for error, item in zip(errors, validated):
+                missing = [pk for pk in item.get(field, ()) if pk not in owned]
+                if missing:
+                    error[field] = [
+                        _('Invalid pk "%(pk)s" - object does not exist.') % {'pk': pk}
+                        for pk in missing
+                    ]
+
+    def check_bulk_unique(self, validated, errors):
+        """record values of the unique field already taken, in the batch or before"""
+        field = self.bulk_unique_field
+        if field is None:
+            return
+        values = [item.get(field) for item in validated]
+        taken = dict(
+            self.get_bulk_queryset().filter(**{f'{field}__in': [v for v in values if v is not None]})
+            .values_list(field, 'pk')
+        )
+        seen = set()
+        for error, item, value in zip(errors, validated, values):
+            if value is None:
+                continue
+            if value in seen or taken.get(value, item.get('id')) != item.get('id'):
+                error[field] = [_('An object with this %(field)s already exists.') % {'field': field}]
+            seen.add(value)
+
+    def split_related(self, item):
+        """return the item fields and its related ids apart"""
+        fields = {key: value for key, value in item.items() if key != 'id'}
+        related = {
+            field: fields.pop(field)
+            for field in self.bulk_related_fields if field in fields
+        }
+        return fields, related
+
+    def bulk_create_objects(self, validated):
+        model = self.queryset.model
+        objs = []
+        links = []
+        for item in validated:
+            fields, related = self.split_related(item)
+            objs.append(model(user=self.request.user, **fields))
+            links.append(related)
+        insert_objects(model, objs, settings.BULK_BATCH_SIZE)
+        self.link_related(objs, links)
+        return objs
+
+    def bulk_update_objects(self, validated, instances):
+        model = self.queryset.model
+        now = timezone.now()
+        objs = []
+        links = []
+        changed = {'updated_at'}
+        for item in validated:
+            obj = instances[item['id']]
+            fields, related = self.split_related(item)
+            for name, value in fields.items():
+                setattr(obj, name, value)
+            changed.update(fields)
+            # bulk_update skips auto_now
+            obj.updated_at = now
+            objs.append(obj)
+            links.append(related)
+        model.objects.bulk_update(objs, sorted(changed), batch_size=settings.BULK_BATCH_SIZE)
+        self.link_related(objs, links, replace=True)
+        return objs
+
+    def link_related(self, objs, links, replace=False):
+        """insert the through rows of the related ids of each object"""
+        model = self.queryset.model
+        for field in self.bulk_related_fields:
+            m2m = model._meta.get_field(field)
+            through = m2m.remote_field.through
+            source = f'{m2m.m2m_field_name()}_id'
+            target = f'{m2m.m2m_reverse_field_name()}_id'
+            linked = [(obj, related[field]) for obj, related in zip(objs, links) if field in related]
+            if replace:
+                through.objects.filter(
+                    **{f'{source}__in': [obj.pk for obj, _ids in linked]}
+                ).delete()
+            through.objects.bulk_create(
+                [
+                    through(**{source: obj.pk, target: pk})
+                    for obj, ids in linked for pk in dict.fromkeys(ids)
+                ],
+                batch_size=settings.BULK_BATCH_SIZE,
+            )
+
+    def bulk_saved(self, objs):
+        """called with the created or updated objects, which skipped the model signals"""
+
+    def bulk_destroy(self, ids):
+        """delete the user's objects with the given ids, report each id"""
+        # true and false are ints too, they would delete the objects 1 and 0
+        if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+            return Response({'detail': _('Expected a list of ids.')},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            queryset = self.get_bulk_queryset().filter(pk__in=ids)
+            found = set(queryset.values_list('pk', flat=True))
+            queryset.delete()
+        return Response([{'id': pk, 'deleted': pk in found} for pk in ids])
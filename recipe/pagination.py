@@ -0,0 +1,161 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """cursor pagination that seeks on the queryset ordering instead of using OFFSET
+
+    the ordering of the queryset must end with a unique field (normally ``id``)
+    so that every row has a distinct position and pages stay stable while rows
+    are inserted or deleted between requests
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        ordering = self.get_ordering(queryset)
+        position, reverse = self.decode_cursor(request)
+        if reverse:
+            queryset = queryset.order_by(*[_invert(field) for field in ordering])
+            ordering = [_invert(field) for field in ordering]
+        if position is not None:
+            position = self._clean_position(queryset, ordering, position)
+            queryset = queryset.filter(self._seek_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+            ordering = [_invert(field) for field in ordering]
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.ordering = ordering
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        """return page size requested by the client, capped at max_page_size"""
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+                if page_size > 0:
+                    return min(page_size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        """return the ordering of the queryset, always ending in the primary key"""
+        ordering = [field for field in queryset.query.order_by if isinstance(field, str)]
+        if not ordering or ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id')
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def decode_cursor(self, request):
+        """return (position, reverse) from the cursor query parameter"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return list(cursor['p']), bool(cursor.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position, reverse):
+        cursor = {'p': position}
+        if reverse:
+            cursor['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(cursor).encode('utf-8')).decode('ascii')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def _position(self, obj):
+        """return the ordering values of obj in a json serializable form"""
+        position = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            if isinstance(value, Decimal):
+                value = str(value)
+            position.append(value)
+        return position
+
+    def _clean_position(self, queryset, ordering, position):
+        """return the cursor values converted by the fields they are compared with
+
+        cursors are client input, values their field rejects mean the cursor
+        was edited
+        """
+        if len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        cleaned = []
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            try:
+                if value is None or isinstance(value, (list, dict)):
+                    raise ValidationError('not a position value')
+                if name in queryset.query.annotations:
+                    model_field = queryset.query.annotations[name].output_field
+                elif name == 'pk':
+                    model_field = queryset.model._meta.pk
+                else:
+                    model_field = queryset.model._meta.get_field(name)
+                cleaned.append(model_field.to_python(value))
+            except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def _seek_filter(self, ordering, position):
+        """build the row comparison that selects rows after position"""
+        seek = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            seek |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return seek
+
+
+def _invert(field):
+    """flip the direction of an ordering field"""
+    return field[1:] if field.startswith('-') else f'-{field}'
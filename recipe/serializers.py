@@ -1,7 +1,50 @@
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
-from core.models import Tag, Ingredient, Recipe
+from core.images import RENDITION_FORMATS
+from core.models import Tag, Ingredient, Recipe, ImageUpload
 
-class TagSerializer(serializers.ModelSerializer):
+
+class ImageSrcsetField(serializers.Field):
+    """map of format and width to the url of each rendition of the recipe image"""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image or recipe.image_status != Recipe.IMAGE_READY:
+            return None
+        request = self.context.get('request')
+        srcset = {}
+        for ext in RENDITION_FORMATS:
+            srcset[ext] = {}
+            for width in settings.RECIPE_IMAGE_WIDTHS:
+                url = reverse('recipe:recipe-image-rendition', args=[recipe.id, width, ext])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                srcset[ext][f'{width}w'] = url
+        return srcset
+
+class UniqueNameMixin:
+    """reject names the requesting user already has an object with"""
+
+    def validate_name(self, value):
+        request = self.context.get('request')
+        if request is None:
+            return value
+        others = self.Meta.model.objects.filter(user=request.user,name=value)
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError(
+                f'{self.Meta.model._meta.verbose_name} with this name already exists.'
+            )
+        return value
+
+
+class TagSerializer(UniqueNameMixin,serializers.ModelSerializer):
     """serializer for tag objects"""
 
     class Meta:
@@ -10,7 +53,7 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(UniqueNameMixin,serializers.ModelSerializer):
     """serializer for ingredient objects"""
 
     class Meta:
@@ -19,12 +62,85 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ('id',)
 
 class RecipeSerializer(serializers.ModelSerializer):
-    """serializer for recipe objects"""
+    """serializer for recipe objects
+
+    tags and ingredients can be given by id, by name, or both, objects with
+    names the user does not have yet are created
+    """
+    image_srcset = ImageSrcsetField()
+    tag_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),write_only=True,required=False
+    )
+    ingredient_names = serializers.ListField(
+        child=serializers.CharField(max_length=255),write_only=True,required=False
+    )
+
+    class Meta:
+        model = Recipe
+        fields = ('id','title','ingredient','tag','time_minutes','price','link','image_status','image_srcset',
+                  'tag_names','ingredient_names')
+        read_only_fields = ('id','image_status')
+        # may be given by name instead
+        extra_kwargs = {
+            'tag': {'required': False,'allow_empty': True},
+            'ingredient': {'required': False,'allow_empty': True},
+        }
+
+    def pop_names(self, validated_data):
+        return {
+            field: validated_data.pop(f'{field}_names')
+            for field in ('tag','ingredient') if f'{field}_names' in validated_data
+        }
+
+    def link_names(self, recipe, names, replace):
+        """link recipe to the named objects, resolved in one query per relation"""
+        for field,field_names in names.items():
+            model = Recipe._meta.get_field(field).related_model
+            ids = model.objects.get_or_create_names(recipe.user,field_names).values()
+            related = getattr(recipe,field)
+            if replace.get(field):
+                related.set(ids)
+            else:
+                related.add(*ids)
+
+    def create(self, validated_data):
+        names = self.pop_names(validated_data)
+        recipe = super().create(validated_data)
+        self.link_names(recipe,names,{})
+        return recipe
+
+    def update(self, instance, validated_data):
+        names = self.pop_names(validated_data)
+        # names replace the relation unless ids are sent along
+        replace = {field: field not in validated_data for field in names}
+        recipe = super().update(instance,validated_data)
+        self.link_names(recipe,names,replace)
+        return recipe
+
+
+class BulkTagSerializer(TagSerializer):
+    """serializer validating the tags of a bulk request"""
+    id = serializers.IntegerField(required=False)
+
+
+class BulkIngredientSerializer(IngredientSerializer):
+    """serializer validating the ingredients of a bulk request"""
+    id = serializers.IntegerField(required=False)
+
+
+class BulkRecipeSerializer(serializers.ModelSerializer):
+    """serializer validating the recipes of a bulk request
+
+    tags and ingredients are plain lists of ids, checked for the whole
+    batch at once instead of with a query per id
+    """
+    id = serializers.IntegerField(required=False)
+    tag = serializers.ListField(child=serializers.IntegerField(),required=False)
+    ingredient = serializers.ListField(child=serializers.IntegerField(),required=False)
 
     class Meta:
         model = Recipe
         fields = ('id','title','ingredient','tag','time_minutes','price','link')
-        read_only_fields = ('id',)
 
 
 class RecipeDetailSerializer(RecipeSerializer):
@@ -34,8 +150,26 @@ class RecipeDetailSerializer(RecipeSerializer):
 
 class RecipeImageSrializer(serializers.ModelSerializer):
     """serializer for recipe image object"""
+    image_srcset = ImageSrcsetField()
 
     class Meta:
         model = Recipe
-        fields = ('id','image')
-        read_only_fields = ('id',)
\ No newline at end of file
+        fields = ('id','image','image_status','image_srcset')
+        read_only_fields = ('id','image_status')
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """serializer for chunked image upload objects"""
+
+    class Meta:
+        model = ImageUpload
+        fields = ('id','file_name','size','offset')
+        read_only_fields = ('id','offset')
+
+    def validate_size(self, value):
+        """reject uploads over the image size limit before any data is sent"""
+        if value > settings.RECIPE_IMAGE_MAX_BYTES:
+            raise serializers.ValidationError(
+                f'image is larger than {settings.RECIPE_IMAGE_MAX_BYTES} bytes'
+            )
+        return value
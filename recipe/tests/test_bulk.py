@@ -0,0 +1,173 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient, Recipe
+
+
+RECIPES_BULK_URL = reverse('recipe:recipe-bulk')
+TAGS_BULK_URL = reverse('recipe:tag-bulk')
+
+
+class BulkRecipeTests(TestCase):
+    """test the bulk recipe endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='vegan')
+        self.ingredient = Ingredient.objects.create(user=self.user, name='salt')
+
+    def recipe_payload(self, i, **params):
+        payload = {
+            'title': f'recipe{i}', 'time_minutes': 5, 'price': '5.00',
+            'tag': [self.tag.id], 'ingredient': [self.ingredient.id],
+        }
+        payload.update(params)
+        return payload
+
+    def test_bulk_create(self):
+        """test recipes and their links are created in a constant number of queries"""
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(RECIPES_BULK_URL, [self.recipe_payload(0)], format='json')
+        Recipe.objects.all().delete()
+        payload = [self.recipe_payload(i) for i in range(50)]
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item['title'] for item in res.data], [f'recipe{i}' for i in range(50)])
+        self.assertEqual(Recipe.objects.filter(user=self.user).count(), 50)
+        recipe = Recipe.objects.get(pk=res.data[7]['id'])
+        self.assertEqual(recipe.title, 'recipe7')
+        self.assertEqual(list(recipe.tag.all()), [self.tag])
+        self.assertEqual(list(recipe.ingredient.all()), [self.ingredient])
+
+    def test_bulk_create_all_or_nothing(self):
+        """test nothing is created when one item is invalid"""
+        payload = [self.recipe_payload(0), self.recipe_payload(1, time_minutes='x')]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_create_other_users_tag(self):
+        """test recipes cannot be linked to the tags of other users"""
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass123')
+        tag = Tag.objects.create(user=other, name='vegan')
+
+        res = self.client.post(
+            RECIPES_BULK_URL, [self.recipe_payload(0, tag=[tag.id])], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('tag', res.data[0])
+        self.assertFalse(Recipe.objects.exists())
+
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_bulk_too_many_items(self):
+        """test batches over the limit are refused"""
+        payload = [self.recipe_payload(i) for i in range(3)]
+
+        res = self.client.post(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        """test recipes and their links are updated together"""
+        recipes = [
+            Recipe.objects.create(user=self.user, title=f'recipe{i}', time_minutes=5, price=5)
+            for i in range(2)
+        ]
+        recipes[0].tag.add(self.tag)
+        tag = Tag.objects.create(user=self.user, name='dessert')
+        payload = [
+            {'id': recipes[0].id, 'title': 'changed', 'tag': [tag.id]},
+            {'id': recipes[1].id, 'price': '7.50'},
+        ]
+
+        res = self.client.patch(RECIPES_BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recipes[0].refresh_from_db()
+        recipes[1].refresh_from_db()
+        self.assertEqual(recipes[0].title, 'changed')
+        self.assertEqual(list(recipes[0].tag.all()), [tag])
+        self.assertEqual(str(recipes[1].price), '7.50')
+        self.assertEqual(recipes[1].title, 'recipe1')
+
+    def test_bulk_update_unknown_id(self):
+        """test updates of recipes of other users are refused"""
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass123')
+        recipe = Recipe.objects.create(user=other, title='test', time_minutes=5, price=5)
+
+        res = self.client.patch(
+            RECIPES_BULK_URL, [{'id': recipe.id, 'title': 'changed'}], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+
+    def test_bulk_delete(self):
+        """test recipes are deleted by id and each id is reported"""
+        recipe = Recipe.objects.create(user=self.user, title='test', time_minutes=5, price=5)
+
+        res = self.client.delete(RECIPES_BULK_URL, [recipe.id, recipe.id + 1], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': recipe.id, 'deleted': True},
+            {'id': recipe.id + 1, 'deleted': False},
+        ])
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_delete_booleans_rejected(self):
+        """test booleans are not taken for ids"""
+        recipe = Recipe.objects.create(user=self.user, title='test', time_minutes=5, price=5)
+
+        res = self.client.delete(RECIPES_BULK_URL, [True], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Recipe.objects.filter(pk=recipe.pk).exists())
+
+
+class BulkTagTests(TestCase):
+    """test the bulk tag endpoints"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create_tags(self):
+        """test tags are created for the user"""
+        res = self.client.post(TAGS_BULK_URL, [{'name': 'vegan'}, {'name': 'dessert'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([tag['name'] for tag in res.data], ['vegan', 'dessert'])
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_duplicate_names(self):
+        """test names taken in the batch or before are refused"""
+        Tag.objects.create(user=self.user, name='vegan')
+
+        res = self.client.post(
+            TAGS_BULK_URL, [{'name': 'vegan'}, {'name': 'new'}, {'name': 'new'}], format='json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([bool(error) for error in res.data], [True, False, True])
+
+    def test_bulk_requires_list(self):
+        """test the body must be a list"""
+        res = self.client.post(TAGS_BULK_URL, {'name': 'vegan'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
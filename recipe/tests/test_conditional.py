@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Recipe
+
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def recipe_detail_url(id):
+    return reverse('recipe:recipe-detail', args=[id])
+
+
+class ConditionalGetTests(TestCase):
+    """test etags and 304 responses of the recipe API"""
+
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='vegan')
+        self.recipe = Recipe.objects.create(user=self.user, title='test', time_minutes=5, price=5)
+        self.recipe.tag.add(self.tag)
+
+    def assertNotModified(self, url, etag):
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def assertModified(self, url, etag):
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res['ETag'], etag)
+
+    def test_list_not_modified(self):
+        """test an unchanged list is answered with a 304"""
+        etag = self.client.get(RECIPES_URL)['ETag']
+
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        with self.assertNumQueries(1):
+            self.assertNotModified(RECIPES_URL, etag)
+
+    def test_list_etag_per_query_string(self):
+        """test lists with other parameters have other etags"""
+        etag = self.client.get(TAGS_URL)['ETag']
+
+        self.assertModified(f'{TAGS_URL}?assigned_only=1', etag)
+
+    def test_list_modified_by_create_and_delete(self):
+        """test adding or deleting an object changes the list etag"""
+        etag = self.client.get(TAGS_URL)['ETag']
+        tag = Tag.objects.create(user=self.user, name='dessert')
+        self.assertModified(TAGS_URL, etag)
+
+        etag = self.client.get(TAGS_URL)['ETag']
+        tag.delete()
+        self.assertModified(TAGS_URL, etag)
+
+    def test_detail_not_modified(self):
+        """test an unchanged recipe is answered with a 304 without serializing"""
+        etag = self.client.get(recipe_detail_url(self.recipe.id))['ETag']
+
+        with self.assertNumQueries(1):
+            self.assertNotModified(recipe_detail_url(self.recipe.id), etag)
+
+    def test_detail_modified_by_related_change(self):
+        """test renaming an included tag changes the recipe etag"""
+        url = recipe_detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+
+        self.tag.name = 'dessert'
+        self.tag.save()
+
+        self.assertModified(url, etag)
+
+    def test_detail_modified_by_unlink(self):
+        """test deleting or unlinking a tag changes the recipe etags"""
+        url = recipe_detail_url(self.recipe.id)
+        etag = self.client.get(url)['ETag']
+        list_etag = self.client.get(RECIPES_URL)['ETag']
+
+        self.tag.delete()
+
+        self.assertModified(url, etag)
+        self.assertModified(RECIPES_URL, list_etag)
+
+    def test_detail_missing(self):
+        """test conditional requests for missing recipes are not found"""
+        res = self.client.get(recipe_detail_url(self.recipe.id + 1), HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_detail_malformed_pk(self):
+        """test conditional requests for malformed ids are not found"""
+        res = self.client.get(RECIPES_URL + 'abc/', HTTP_IF_NONE_MATCH='*')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
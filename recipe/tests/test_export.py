@@ -0,0 +1,70 @@
+import csv
+import json
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Tag, Ingredient, Recipe
+
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportTests(TestCase):
+    """test the streaming export of recipes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        ingredient = Ingredient.objects.create(user=self.user, name='salt')
+        for i in range(5):
+            recipe = Recipe.objects.create(
+                user=self.user, title=f'recipe{i}', time_minutes=5, price='5.50'
+            )
+            recipe.tag.add(tag)
+            recipe.ingredient.add(ingredient)
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass123')
+        Recipe.objects.create(user=other, title='other', time_minutes=5, price=5)
+
+    def export(self, **params):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return b''.join(res.streaming_content).decode('utf-8'), res
+
+    def test_export_ndjson(self):
+        """test recipes are exported one json object per line"""
+        content, res = self.export()
+
+        recipes = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([recipe['title'] for recipe in recipes], [f'recipe{i}' for i in range(5)])
+        self.assertEqual(recipes[0]['price'], '5.50')
+        self.assertEqual(recipes[0]['tags'], ['vegan'])
+        self.assertEqual(recipes[0]['ingredients'], ['salt'])
+
+    def test_export_csv(self):
+        """test recipes are exported as csv with a header row"""
+        content, res = self.export(export_format='csv')
+
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['title'], 'recipe0')
+        self.assertEqual(json.loads(rows[0]['tags']), ['vegan'])
+
+    @override_settings(EXPORT_CHUNK_SIZE=2)
+    def test_export_queries_per_chunk(self):
+        """test names are fetched per chunk rather than per recipe"""
+        with self.assertNumQueries(1 + 3 * 2):
+            self.export()
+
+    def test_export_unknown_format(self):
+        """test unknown export formats are rejected"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,5 +1,5 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
@@ -8,6 +8,7 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENT_URL = reverse('recipe:ingredient-list')
+AUTOCOMPLETE_URL = reverse('recipe:ingredient-autocomplete')
 
 
 class PublicTestForIngredient(TestCase):
@@ -49,7 +50,7 @@ class PrivateTestForIngredient(TestCase):
         ingredient_srealizer = IngredientSerializer(ingredients,many=True)
 
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(res.data,ingredient_srealizer.data)
+        self.assertEqual(res.data['results'],ingredient_srealizer.data)
 
     def test_ingredient_limited(self):
         """ingredient must show for own user"""
@@ -68,8 +69,8 @@ class PrivateTestForIngredient(TestCase):
         res = self.client.get(INGREDIENT_URL)
 
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(len(res.data),1)
-        self.assertEqual(res.data[0]['name'],ingredient.name)
+        self.assertEqual(len(res.data['results']),1)
+        self.assertEqual(res.data['results'][0]['name'],ingredient.name)
 
         def test_create_ingredient_successful(self):
             """test create ingredient successfuly"""
@@ -114,8 +115,8 @@ class PrivateTestForIngredient(TestCase):
         serializer2 = IngredientSerializer(ingredient2)
 
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertIn(serializer1.data,res.data)
-        self.assertNotIn(serializer2.data,res.data)
+        self.assertIn(serializer1.data,res.data['results'])
+        self.assertNotIn(serializer2.data,res.data['results'])
 
     def test_retrieving_ingredients_assigned_unique(self):
         """test filtering ingredients by assigned returns unique items"""
@@ -143,4 +144,54 @@ class PrivateTestForIngredient(TestCase):
         recipe2.ingredient.add(ingredient1)
         res = self.client.get(INGREDIENT_URL,{'assigned_only': 1})
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(len(res.data),1)
\ No newline at end of file
+        self.assertEqual(len(res.data['results']),1)
+
+class IngredientAutocompleteTests(TestCase):
+    """test suggesting ingredient names"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'passs122')
+        self.client.force_authenticate(self.user)
+        for name in ('Tomato', 'Tofu', 'Potato', 'Toast'):
+            Ingredient.objects.create(user=self.user, name=name)
+
+    def test_autocomplete_prefix(self):
+        """test names starting with q are suggested in order, ignoring case"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'to'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([obj['name'] for obj in res.data], ['Toast', 'Tofu', 'Tomato'])
+
+    def test_autocomplete_limit(self):
+        """test at most limit names are suggested"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'to', 'limit': 2})
+
+        self.assertEqual([obj['name'] for obj in res.data], ['Toast', 'Tofu'])
+
+    def test_autocomplete_limited_to_user(self):
+        """test other users' names are not suggested"""
+        other = get_user_model().objects.create_user('other@gmail.com', 'passs122')
+        Ingredient.objects.create(user=other, name='Tortilla')
+
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'tor'})
+
+        self.assertEqual(res.data, [])
+
+    @override_settings(RESPONSE_CACHE_ENABLED=True)
+    def test_autocomplete_cached(self):
+        """test suggestions are cached until an ingredient changes"""
+        self.client.get(AUTOCOMPLETE_URL, {'q': 'to'})
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'to'})
+        self.assertEqual(res['X-Cache'], 'HIT')
+
+        Ingredient.objects.create(user=self.user, name='Tomatillo')
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': 'to'})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertIn('Tomatillo', [obj['name'] for obj in res.data])
+
+    def test_autocomplete_requires_text(self):
+        """test an empty q is rejected"""
+        res = self.client.get(AUTOCOMPLETE_URL, {'q': ' '})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,108 @@
+import json
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.conf import settings
+from django.urls import reverse
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.caching import cache_stats
+from core.models import Tag, Recipe
+
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def result_names(res, field='name'):
+    return [item[field] for item in json.loads(res.content)['results']]
+
+
+@override_settings(RESPONSE_CACHE_ENABLED=True)
+class ListCacheTests(TestCase):
+    """test the per user cache of list responses"""
+
+    def setUp(self):
+        caches[settings.RESPONSE_CACHE_ALIAS].clear()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'pass123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_cached(self):
+        """test a repeated list is served from the cache"""
+        Tag.objects.create(user=self.user, name='vegan')
+
+        res = self.client.get(TAGS_URL)
+        self.assertEqual(res['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['X-Cache'], 'HIT')
+        self.assertEqual(result_names(res), ['vegan'])
+        self.assertEqual(cache_stats()['hits'], 1)
+        self.assertEqual(cache_stats()['misses'], 1)
+
+    def test_query_string_cached_apart(self):
+        """test lists with other parameters are cached separately"""
+        self.client.get(TAGS_URL)
+
+        res = self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+
+    def test_cache_per_user(self):
+        """test users never see the cached lists of others"""
+        Tag.objects.create(user=self.user, name='vegan')
+        self.client.get(TAGS_URL)
+        other = get_user_model().objects.create_user('other@gmail.com', 'pass123')
+        self.client.force_authenticate(other)
+
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(result_names(res), [])
+
+    def test_invalidated_on_change(self):
+        """test changing a tag invalidates the cached lists of its user"""
+        tag = Tag.objects.create(user=self.user, name='vegan')
+        self.client.get(TAGS_URL)
+
+        tag.name = 'dessert'
+        tag.save()
+        res = self.client.get(TAGS_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(result_names(res), ['dessert'])
+
+    def test_invalidated_on_link(self):
+        """test linking a tag to a recipe invalidates the cached recipes"""
+        recipe = Recipe.objects.create(user=self.user, title='test', time_minutes=5, price=5)
+        self.client.get(RECIPES_URL)
+
+        recipe.tag.add(Tag.objects.create(user=self.user, name='vegan'))
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res['X-Cache'], 'MISS')
+        self.assertEqual(len(json.loads(res.content)['results'][0]['tag']), 1)
+
+    @override_settings(RESPONSE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        """test lists are not cached without a cache shared by the workers"""
+        self.client.get(TAGS_URL)
+        res = self.client.get(TAGS_URL)
+
+        self.assertNotIn('X-Cache', res)
+        self.assertEqual(cache_stats()['hits'], 0)
+
+    def test_stats_admin_only(self):
+        """test the cache statistics are only exposed to staff"""
+        url = reverse('cache-stats')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        admin = get_user_model().objects.create_superuser('admin@gmail.com', 'pass123')
+        self.client.force_authenticate(admin)
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_ratio', res.data)
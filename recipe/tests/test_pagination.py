@@ -0,0 +1,118 @@
+import base64
+import json
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Recipe, Tag
+
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def sample_recipe(user, title='test'):
+    """create sample recipe"""
+    return Recipe.objects.create(user=user, title=title, time_minutes=5, price=10)
+
+
+class KeysetPaginationTests(TestCase):
+    """test cursor pagination of the recipe API lists"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'pass123'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def collect(self, url, params):
+        """follow next links and return the ids of every page"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([item['id'] for item in res.data['results']])
+            if not res.data['next']:
+                return pages
+            res = self.client.get(res.data['next'])
+
+    def test_recipes_paginated_newest_first(self):
+        """test recipes are split in pages ordered by id"""
+        ids = [sample_recipe(self.user).id for _ in range(5)]
+
+        pages = self.collect(RECIPE_URL, {'page_size': 2})
+
+        self.assertEqual(pages, [ids[4:2:-1], ids[2:0:-1], ids[:1]])
+
+    def test_pages_stable_under_inserts(self):
+        """test rows inserted while paging do not shift the next page"""
+        ids = [sample_recipe(self.user).id for _ in range(4)]
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        sample_recipe(self.user)
+
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual([item['id'] for item in res.data['results']], ids[1::-1])
+
+    def test_tags_not_skipped(self):
+        """test tags are all returned across pages in name order"""
+        tags = [Tag.objects.create(user=self.user, name=f'tag{i}') for i in range(5)]
+
+        pages = self.collect(TAGS_URL, {'page_size': 2})
+
+        ids = [tag_id for page in pages for tag_id in page]
+        self.assertEqual(ids, [tag.id for tag in reversed(tags)])
+
+    def test_previous_link(self):
+        """test the previous link returns the earlier page"""
+        for _ in range(3):
+            sample_recipe(self.user)
+        first = self.client.get(RECIPE_URL, {'page_size': 2})
+        second = self.client.get(first.data['next'])
+
+        res = self.client.get(second.data['previous'])
+
+        self.assertEqual(res.data['results'], first.data['results'])
+        self.assertIsNone(first.data['previous'])
+
+    def test_invalid_cursor(self):
+        """test a malformed cursor is rejected"""
+        res = self.client.get(RECIPE_URL, {'cursor': 'bad'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_edited_cursor(self):
+        """test cursors with values their fields reject are not found"""
+        def cursor(position):
+            return base64.urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+
+        for params in (
+            {'cursor': cursor(['abc'])},
+            {'cursor': cursor([None])},
+            {'cursor': cursor([[1]])},
+            {'cursor': cursor(['abc', 1]), 'ordering': 'price'},
+            {'cursor': cursor(['1.5', 'x']), 'ordering': 'price'},
+        ):
+            with self.subTest(params=params):
+                res = self.client.get(RECIPE_URL, params)
+
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_ordering_by_price_not_skipped(self):
+        """test recipes ordered by price are all returned with ties broken by id"""
+        prices = [5, 3, 5, 1, 5]
+        recipes = [
+            Recipe.objects.create(user=self.user, title='test', time_minutes=5, price=price)
+            for price in prices
+        ]
+
+        pages = self.collect(RECIPE_URL, {'page_size': 2, 'ordering': '-price'})
+
+        expected = sorted(recipes, key=lambda recipe: (recipe.price, recipe.id), reverse=True)
+        self.assertEqual(
+            [recipe_id for page in pages for recipe_id in page],
+            [recipe.id for recipe in expected],
+        )
@@ -1,11 +1,24 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APIClient
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageUpload, Recipe, Tag, Ingredient
+from core.uploads import receive_chunk
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.http import UnreadablePostError
+from django.test import override_settings
+from datetime import timedelta
+from io import BytesIO
+from unittest.mock import Mock, patch
 from PIL import Image
+import hashlib
+import shutil
 import tempfile
 import os
 RECIPE_URL = reverse('recipe:recipe-list')
@@ -30,6 +43,10 @@ def recipe_upload_url(id):
     """create sample url for uploading image """
     return reverse('recipe:recipe-upload-image',args=[id])
 
+def recipe_rendition_url(id, width, ext):
+    """create sample url for an image rendition"""
+    return reverse('recipe:recipe-image-rendition', args=[id, width, ext])
+
 def sample_recipe(user, **params):
     """create sample recipe"""
     default = {
@@ -74,7 +91,7 @@ class PrivateRecipeTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_limited_to_user(self):
         """recipe must returned for own user"""
@@ -89,8 +106,8 @@ class PrivateRecipeTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_recipe_datial(self):
         """test detailed recipe"""
@@ -102,6 +119,40 @@ class PrivateRecipeTests(TestCase):
 
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_recipes_query_count_constant(self):
+        """test listing recipes does not issue a query per recipe"""
+        tag = sample_tag(user=self.user)
+        ingredient = sample_ingredient(user=self.user)
+
+        def add_recipes(count):
+            for _ in range(count):
+                recipe = sample_recipe(user=self.user)
+                recipe.tag.add(tag)
+                recipe.ingredient.add(ingredient)
+
+        add_recipes(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(RECIPE_URL)
+        add_recipes(20)
+        with CaptureQueriesContext(connection) as many:
+            res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(len(res.data['results']), 22)
+        self.assertEqual(len(many), len(few))
+
+    def test_recipe_detail_query_count_constant(self):
+        """test retrieving a recipe fetches its tags and ingredients in bulk"""
+        recipe = sample_recipe(user=self.user)
+        for i in range(10):
+            recipe.tag.add(sample_tag(user=self.user, name=f'tag{i}'))
+            recipe.ingredient.add(sample_ingredient(user=self.user, name=f'ing{i}'))
+
+        with self.assertNumQueries(3):
+            res = self.client.get(recipe_detail_url(recipe.id))
+
+        self.assertEqual(len(res.data['tag']), 10)
+        self.assertEqual(len(res.data['ingredient']), 10)
+
 
     def test_partial_update_recipe(self):
         """test updating recipe with patch"""
@@ -120,6 +171,32 @@ class PrivateRecipeTests(TestCase):
         self.assertEqual(len(tags),1)
         self.assertIn(new_tag,tags)
 
+    def test_create_recipe_with_tag_names(self):
+        """test tags given by name are reused or created"""
+        vegan = sample_tag(user=self.user, name='vegan')
+        payload = {
+            'title': 'salad',
+            'time_minutes': 5,
+            'price': 3.00,
+            'tag_names': ['vegan', 'quick', 'quick'],
+        }
+        res = self.client.post(RECIPE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=res.data['id'])
+        self.assertEqual(sorted(recipe.tag.values_list('name', flat=True)), ['quick', 'vegan'])
+        self.assertIn(vegan, recipe.tag.all())
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_partial_update_recipe_tag_names(self):
+        """test tag names replace the tags of a recipe"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tag.add(sample_tag(user=self.user, name='old'))
+        res = self.client.patch(recipe_detail_url(recipe.id), {'tag_names': ['new']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(recipe.tag.values_list('name', flat=True)), ['new'])
+
     # def test_full_update_recipe(self):
     #     """test updating a recipe with put"""
     #     recipe = sample_recipe(user=self.user)
@@ -166,6 +243,8 @@ class RecipeUploadImageTest(TestCase):
         self.assertEqual(res.status_code,status.HTTP_200_OK)
         self.assertIn('image',res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
+        self.assertEqual(res.data['image_status'],Recipe.IMAGE_PENDING)
+        self.assertEqual(self.recipe.image_status,Recipe.IMAGE_PENDING)
 
 
     def test_upload_image_bad_request(self):
@@ -187,9 +266,9 @@ class RecipeUploadImageTest(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
 
     def test_filter_recipes_by_ingredients(self):
         """Test returning recipes with specific ingredients"""
@@ -204,6 +283,427 @@ class RecipeUploadImageTest(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
\ No newline at end of file
+        self.assertIn(serializer1.data, res.data['results'])
+        self.assertIn(serializer2.data, res.data['results'])
+        self.assertNotIn(serializer3.data, res.data['results'])
+
+class RecipeFilterTests(TestCase):
+    """test filtering recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'test1234556'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag1 = sample_tag(user=self.user, name='Vegan')
+        self.tag2 = sample_tag(user=self.user, name='Dessert')
+        self.ingredient = sample_ingredient(user=self.user, name='Salt')
+
+    def result_ids(self, params):
+        res = self.client.get(RECIPE_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe['id'] for recipe in res.data['results']]
+
+    def test_filter_any_returns_recipe_once(self):
+        """test recipes matching several ids are not duplicated"""
+        recipe = sample_recipe(user=self.user)
+        recipe.tag.add(self.tag1, self.tag2)
+
+        ids = self.result_ids({'tags': f'{self.tag1.id},{self.tag2.id}'})
+
+        self.assertEqual(ids, [recipe.id])
+
+    def test_filter_all_tags(self):
+        """test match all only returns recipes having every tag"""
+        both = sample_recipe(user=self.user)
+        both.tag.add(self.tag1, self.tag2)
+        one = sample_recipe(user=self.user)
+        one.tag.add(self.tag1)
+
+        ids = self.result_ids({
+            'tags': f'{self.tag1.id},{self.tag2.id}',
+            'tags_match': 'all',
+        })
+
+        self.assertEqual(ids, [both.id])
+
+    def test_filter_tags_and_ingredients(self):
+        """test tag and ingredient filters are combined"""
+        recipe1 = sample_recipe(user=self.user)
+        recipe1.tag.add(self.tag1)
+        recipe1.ingredient.add(self.ingredient)
+        recipe2 = sample_recipe(user=self.user)
+        recipe2.tag.add(self.tag1)
+
+        ids = self.result_ids({
+            'tags': f'{self.tag1.id}',
+            'ingredients': f'{self.ingredient.id}',
+        })
+
+        self.assertEqual(ids, [recipe1.id])
+
+    def test_filter_invalid_ids(self):
+        """test non numeric ids are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': 'a,b'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_filter_invalid_match(self):
+        """test unknown match modes are rejected"""
+        res = self.client.get(RECIPE_URL, {'tags': '1', 'tags_match': 'some'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_title_and_names(self):
+        """test ?q= matches titles, tag names and ingredient names"""
+        soup = sample_recipe(user=self.user, title='Tomato soup')
+        cake = sample_recipe(user=self.user, title='Cake')
+        cake.tag.add(self.tag2)
+        salted = sample_recipe(user=self.user, title='Fries')
+        salted.ingredient.add(self.ingredient)
+
+        self.assertEqual(self.result_ids({'q': 'soup'}), [soup.id])
+        self.assertEqual(self.result_ids({'q': 'dessert'}), [cake.id])
+        self.assertEqual(self.result_ids({'q': 'salt'}), [salted.id])
+
+    def test_search_all_words(self):
+        """test every word of ?q= has to match"""
+        recipe = sample_recipe(user=self.user, title='Tomato soup')
+        recipe.tag.add(self.tag1)
+        sample_recipe(user=self.user, title='Onion soup')
+
+        self.assertEqual(self.result_ids({'q': 'soup vegan'}), [recipe.id])
+
+    def test_filter_price_and_time_ranges(self):
+        """test min_ and max_ bounds are inclusive and combined"""
+        quick_cheap = sample_recipe(user=self.user, time_minutes=10, price=5)
+        sample_recipe(user=self.user, time_minutes=10, price=20)
+        sample_recipe(user=self.user, time_minutes=60, price=5)
+
+        ids = self.result_ids({'max_time_minutes': 10, 'min_price': '5', 'max_price': '5.00'})
+
+        self.assertEqual(ids, [quick_cheap.id])
+
+    def test_filter_invalid_range(self):
+        """test non numeric bounds are rejected"""
+        for param in ('min_price', 'max_time_minutes'):
+            res = self.client.get(RECIPE_URL, {param: 'cheap'})
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ordering(self):
+        """test recipes are sorted by the ordering field, then id"""
+        slow = sample_recipe(user=self.user, time_minutes=60)
+        quick1 = sample_recipe(user=self.user, time_minutes=5)
+        quick2 = sample_recipe(user=self.user, time_minutes=5)
+
+        self.assertEqual(
+            self.result_ids({'ordering': 'time_minutes'}), [quick1.id, quick2.id, slow.id]
+        )
+        self.assertEqual(
+            self.result_ids({'ordering': '-time_minutes'}), [slow.id, quick2.id, quick1.id]
+        )
+
+    def test_invalid_ordering(self):
+        """test unknown ordering fields are rejected"""
+        res = self.client.get(RECIPE_URL, {'ordering': 'title'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(SEARCH_MAX_LENGTH=10)
+    def test_search_too_long(self):
+        """test overly long search texts are rejected"""
+        res = self.client.get(RECIPE_URL, {'q': 'x' * 11})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class RecipeImageRenditionTests(TestCase):
+    """test the responsive renditions of recipe images"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'test1234556'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+        with tempfile.NamedTemporaryFile(suffix='.jpg') as ntf:
+            Image.new('RGB', (800, 400)).save(ntf, format='JPEG')
+            ntf.seek(0)
+            self.recipe.image.save('image.jpg', File(ntf))
+        self.recipe.image_status = Recipe.IMAGE_READY
+        self.recipe.save()
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def test_srcset_listed(self):
+        """test the recipe lists a rendition url per format and width"""
+        res = self.client.get(recipe_detail_url(self.recipe.id))
+
+        srcset = res.data['image_srcset']
+        self.assertEqual(set(srcset), {'webp', 'jpeg'})
+        self.assertEqual(
+            srcset['webp']['320w'],
+            'http://testserver' + recipe_rendition_url(self.recipe.id, 320, 'webp')
+        )
+
+    def test_rendition_rendered_once(self):
+        """test renditions are scaled and reused from storage"""
+        url = recipe_rendition_url(self.recipe.id, 320, 'webp')
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['Content-Type'], 'image/webp')
+        with Image.open(BytesIO(b''.join(res.streaming_content))) as image:
+            self.assertEqual(image.size, (320, 160))
+
+        with patch('core.images.render_rendition') as render:
+            res = self.client.get(url)
+            b''.join(res.streaming_content)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        render.assert_not_called()
+
+    def test_rendition_unknown_width(self):
+        """test only the configured widths are rendered"""
+        res = self.client.get(recipe_rendition_url(self.recipe.id, 321, 'webp'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_rendition_pending_image(self):
+        """test no renditions are offered before the image is processed"""
+        self.recipe.image_status = Recipe.IMAGE_PENDING
+        self.recipe.save()
+
+        res = self.client.get(recipe_rendition_url(self.recipe.id, 320, 'webp'))
+        detail = self.client.get(recipe_detail_url(self.recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNone(detail.data['image_srcset'])
+
+
+def image_bytes(size=(10, 10), fmt='JPEG'):
+    """return the bytes of an image of the given size, a jpeg by default"""
+    output = BytesIO()
+    Image.new('RGB', size).save(output, format=fmt)
+    return output.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class StreamingImageUploadTests(TestCase):
+    """test the size limits and chunked uploads of recipe images"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'test@gmail.com',
+            'test1234556'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, data):
+        image = SimpleUploadedFile('image.jpg', data, content_type='image/jpeg')
+        return self.client.post(recipe_upload_url(self.recipe.id), {'image': image}, format='multipart')
+
+    def stored_files(self):
+        return [
+            name for _, _, names in os.walk(settings.MEDIA_ROOT) for name in names
+        ]
+
+    def test_upload_hashes_content(self):
+        """test the image is stored with the sha256 of its content"""
+        data = image_bytes()
+        res = self.upload(data)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.image_sha256, hashlib.sha256(data).hexdigest())
+        with open(self.recipe.image.path, 'rb') as stored:
+            self.assertEqual(stored.read(), data)
+
+    def test_identical_uploads_share_file(self):
+        """test the same image uploaded to two recipes is stored once"""
+        data = image_bytes()
+        other = sample_recipe(user=self.user)
+        self.upload(data)
+        image = SimpleUploadedFile('other.jpg', data, content_type='image/jpeg')
+        self.client.post(recipe_upload_url(other.id), {'image': image}, format='multipart')
+
+        self.recipe.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertEqual(self.stored_files(), [os.path.basename(other.image.name)])
+
+    def test_upload_unsupported_format(self):
+        """test images in formats that are not kept are rejected and not kept"""
+        for fmt in ('BMP', 'TIFF'):
+            with self.subTest(fmt=fmt):
+                res = self.upload(image_bytes(fmt=fmt))
+
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(self.stored_files(), [])
+
+    @override_settings(RECIPE_IMAGE_MAX_BYTES=100)
+    def test_upload_too_many_bytes(self):
+        """test uploads over the byte limit are rejected and not kept"""
+        res = self.upload(image_bytes())
+
+        self.assertEqual(res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(self.stored_files(), [])
+
+    @override_settings(RECIPE_IMAGE_MAX_PIXELS=50)
+    def test_upload_too_many_pixels(self):
+        """test images over the pixel limit are rejected from their header"""
+        res = self.upload(image_bytes((10, 10)))
+
+        self.assertEqual(res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertEqual(self.stored_files(), [])
+
+    def test_upload_not_an_image(self):
+        """test files that are not images are rejected"""
+        res = self.upload(b'not an image')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.stored_files(), [])
+
+    def start_chunked_upload(self, size):
+        url = reverse('recipe:recipe-create-image-upload', args=[self.recipe.id])
+        res = self.client.post(url, {'file_name': 'image.jpg', 'size': size})
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return reverse('recipe:recipe-image-upload-chunk', args=[self.recipe.id, res.data['id']])
+
+    def put_chunk(self, url, data, offset):
+        return self.client.generic(
+            'PUT', url, data, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_chunked_upload(self):
+        """test an image sent in chunks is attached once complete"""
+        data = image_bytes()
+        url = self.start_chunked_upload(len(data))
+
+        res = self.put_chunk(url, data[:100], 0)
+        self.assertEqual(res.data['offset'], 100)
+        self.assertEqual(self.client.get(url).data['offset'], 100)
+        res = self.put_chunk(url, data[100:], 100)
+
+        self.recipe.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.image_sha256, hashlib.sha256(data).hexdigest())
+        with open(self.recipe.image.path, 'rb') as stored:
+            self.assertEqual(stored.read(), data)
+
+    def test_chunked_upload_wrong_offset(self):
+        """test chunks must continue from the received offset"""
+        data = image_bytes()
+        url = self.start_chunked_upload(len(data))
+
+        res = self.put_chunk(url, data[100:], 100)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data['offset'], 0)
+
+    def test_chunked_upload_past_size(self):
+        """test chunks cannot go past the announced size"""
+        url = self.start_chunked_upload(10)
+
+        res = self.put_chunk(url, image_bytes(), 0)
+
+        self.assertEqual(res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    def test_unreadable_chunk_removed(self):
+        """test the file of a chunk is removed when the body cannot be read"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        stream = Mock()
+        stream.read.side_effect = [b'xxxxx', UnreadablePostError('connection reset')]
+
+        with self.assertRaises(UnreadablePostError):
+            receive_chunk(stream, 10, os.path.join(directory, 'upload.part'))
+
+        self.assertEqual(os.listdir(directory), [])
+
+    @override_settings(RECIPE_IMAGE_MAX_UPLOADS=2)
+    def test_chunked_uploads_capped(self):
+        """test a user cannot keep more uploads open than the limit"""
+        url = reverse('recipe:recipe-create-image-upload', args=[self.recipe.id])
+        self.start_chunked_upload(10)
+        self.start_chunked_upload(10)
+
+        res = self.client.post(url, {'file_name': 'image.jpg', 'size': 10})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(ImageUpload.objects.count(), 2)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), RECIPE_IMAGE_WORKERS=0)
+class ReplacedImageTests(TransactionTestCase):
+    """test replaced images are deleted once the new one is committed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'test1234556')
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, data):
+        image = SimpleUploadedFile('image.jpg', data, content_type='image/jpeg')
+        return self.client.post(recipe_upload_url(self.recipe.id), {'image': image}, format='multipart')
+
+    def test_replaced_image_deleted(self):
+        """test an image no recipe uses anymore is deleted on upload"""
+        self.upload(image_bytes((10, 10)))
+        self.upload(image_bytes((20, 20)))
+
+        self.recipe.refresh_from_db()
+        stored = [name for _, _, names in os.walk(settings.MEDIA_ROOT) for name in names]
+        self.assertEqual(stored, [os.path.basename(self.recipe.image.name)])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImageUploadCleanupTests(TransactionTestCase):
+    """test partial data of chunked uploads does not outlive them"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user('test@gmail.com', 'test1234556')
+        self.client.force_authenticate(self.user)
+        self.recipe = sample_recipe(user=self.user)
+        self.url = reverse('recipe:recipe-create-image-upload', args=[self.recipe.id])
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def start_upload(self):
+        res = self.client.post(self.url, {'file_name': 'image.jpg', 'size': 10})
+        upload = ImageUpload.objects.get(pk=res.data['id'])
+        path = self.recipe.image.storage.path(upload.partial_name)
+        self.assertTrue(os.path.exists(path))
+        return upload, path
+
+    def test_expired_uploads_deleted(self):
+        """test uploads left unfinished past the expiry are deleted with their data"""
+        upload, path = self.start_upload()
+        ImageUpload.objects.filter(pk=upload.pk).update(
+            created=upload.created - timedelta(seconds=settings.RECIPE_IMAGE_UPLOAD_EXPIRY + 1)
+        )
+
+        self.start_upload()
+
+        self.assertFalse(ImageUpload.objects.filter(pk=upload.pk).exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_partial_data_deleted_with_recipe(self):
+        """test deleting the recipe deletes the partial data of its uploads"""
+        _upload, path = self.start_upload()
+
+        self.recipe.delete()
+
+        self.assertFalse(os.path.exists(path))
@@ -43,7 +43,7 @@ class PrivateTagsAPITests(TestCase):
         serializer = TagSerializer(tags,many=True)
 
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(res.data,serializer.data)
+        self.assertEqual(res.data['results'],serializer.data)
 
     def test_tags_limited_to_user(self):
         """test that tags returned are for the authenticated user"""
@@ -57,8 +57,8 @@ class PrivateTagsAPITests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(len(res.data),1)
-        self.assertEqual(res.data[0]['name'],tag.name)
+        self.assertEqual(len(res.data['results']),1)
+        self.assertEqual(res.data['results'][0]['name'],tag.name)
 
     def test_create_tag_successful(self):
         """test create new tag"""
@@ -69,6 +69,15 @@ class PrivateTagsAPITests(TestCase):
         exists = Tag.objects.filter(user=self.user,name=payload['name']).exists()
         self.assertTrue(exists)
 
+    def test_create_tag_duplicate_name(self):
+        """test a user cannot create two tags with the same name"""
+        Tag.objects.create(user=self.user,name='vegan')
+
+        res = self.client.post(TAGS_URL,{'name':'vegan'})
+
+        self.assertEqual(res.status_code,status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(),1)
+
     def test_create_tag_invalid(self):
         """test create tag with invalid tag data"""
         payload = {
@@ -100,8 +109,8 @@ class PrivateTagsAPITests(TestCase):
         serializer2 = TagSerializer(tag2)
 
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertIn(serializer1.data,res.data)
-        self.assertNotIn(serializer2.data,res.data)
+        self.assertIn(serializer1.data,res.data['results'])
+        self.assertNotIn(serializer2.data,res.data['results'])
 
     def test_retrieving_tags_assigned_unique(self):
         """test filtering tags by assigned returns unique items"""
@@ -129,4 +138,4 @@ class PrivateTagsAPITests(TestCase):
         recipe2.tag.add(tag1)
         res = self.client.get(TAGS_URL,{'assigned_only': 1})
         self.assertEqual(res.status_code,status.HTTP_200_OK)
-        self.assertEqual(len(res.data),1)
+        self.assertEqual(len(res.data['results']),1)
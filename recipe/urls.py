@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.urls import path,include
+from django.urls.resolvers import URLPattern
 from rest_framework.routers import DefaultRouter
+from core.async_views import async_read_view
 from recipe import views
 
 
@@ -10,6 +13,20 @@ router.register('recipes',views.RecipeViewSet)
 
 app_name = 'recipe'
 
+# list and detail routes of the read heavy endpoints, served concurrently
+# under ASGI when ASYNC_READ_VIEWS is set
+ASYNC_ROUTES = ('-list','-detail','-autocomplete')
+
+
+def async_reads(patterns):
+    return [
+        URLPattern(pattern.pattern,async_read_view(pattern.callback),pattern.default_args,pattern.name)
+        if isinstance(pattern,URLPattern) and (pattern.name or '').endswith(ASYNC_ROUTES)
+        else pattern
+        for pattern in patterns
+    ]
+
+
 urlpatterns = [
-path('',include(router.urls))
+path('',include(async_reads(router.urls) if settings.ASYNC_READ_VIEWS else router.urls))
 ]
@@ -1,18 +1,49 @@
+import os
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.translation import gettext as _
 from rest_framework import viewsets, mixins,status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
-from core.models import Tag, Ingredient, Recipe
+from core.authentication import CachedTokenAuthentication
+from core.images import enqueue_image, get_rendition, release_image
+from core.media import media_response
+from core.models import Tag, Ingredient, Recipe, ImageUpload
+from core.routers import ReplicaReadMixin
+from core.search import update_search_vectors
+from core.uploads import (
+    ImageRejected, StoredImageFile, StreamingImageUploadHandler,
+    append_chunk, check_image_file, expire_uploads, finish_upload, receive_chunk,
+    store_image,
+)
 from recipe import serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from recipe.export import EXPORT_FORMATS, EXPORT_NDJSON, stream_export
+from recipe.filters import RecipeFilter
+from recipe.mixins import AutocompleteMixin, BulkMixin, CachedListMixin, ConditionalMixin
+from recipe.pagination import KeysetPagination
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
+class BaseRecipeAttrViewSet(ReplicaReadMixin,
+                            AutocompleteMixin,
+                            BulkMixin,
+                            CachedListMixin,
+                            ConditionalMixin,
+                            viewsets.GenericViewSet,
                             mixins.ListModelMixin,
                             mixins.CreateModelMixin):
     """Base class for recipe attrebutes"""
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    pagination_class = KeysetPagination
+
+    bulk_unique_field = 'name'
+    replica_actions = ('list','autocomplete')
 
     def get_queryset(self):
         """return objects for current authenticated user only"""
@@ -20,12 +51,26 @@ class BaseRecipeAttrViewSet(viewsets.GenericViewSet,
         queryset = self.queryset
         if assigned_only:
             queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by('-name').distinct()
+        return queryset.filter(user=self.request.user).order_by('-name','-id').distinct()
+
+    def get_etag_querysets(self):
+        """assigned_only lists also change with the links of the recipes"""
+        querysets = super().get_etag_querysets()
+        if bool(int(self.request.query_params.get('assigned_only',0))):
+            querysets.append(Recipe.objects.filter(user=self.request.user))
+        return querysets
 
     def perform_create(self,serializer):
         """create new attrebutes"""
         serializer.save(user=self.request.user)
 
+    def bulk_saved(self,objs):
+        """renamed objects change the search vectors of their recipes"""
+        related_name = self.queryset.model._meta.model_name
+        update_search_vectors(
+            Recipe.objects.filter(**{f'{related_name}__in':objs}).values_list('pk',flat=True).distinct()
+        )
+
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
@@ -33,39 +78,40 @@ class TagViewSet(BaseRecipeAttrViewSet):
 
     queryset = Tag.objects.all()
     serializer_class = serializers.TagSerializer
+    bulk_serializer_class = serializers.BulkTagSerializer
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """manage ingredients in the database"""
 
     serializer_class = serializers.IngredientSerializer
+    bulk_serializer_class = serializers.BulkIngredientSerializer
     queryset = Ingredient.objects.all()
 
 
-class RecipeViewSet (viewsets.ModelViewSet):
+class RecipeViewSet (ReplicaReadMixin,BulkMixin,CachedListMixin,ConditionalMixin,viewsets.ModelViewSet):
     """manage recipes in the database"""
 
     serializer_class = serializers.RecipeSerializer
     queryset = Recipe.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
-
-    def _params_to_ints(self, qs):
-        """Convert a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(',')]
+    pagination_class = KeysetPagination
+    etag_related_fields = ('tag','ingredient')
+    bulk_serializer_class = serializers.BulkRecipeSerializer
+    bulk_related_fields = ('tag','ingredient')
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
-        tags = self.request.query_params.get('tags')
-        ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
-        if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tag__id__in=tag_ids)
-        if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredient__id__in=ingredient_ids)
-        return queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        recipe_filter = RecipeFilter(self.request.query_params)
+        queryset = recipe_filter.filter_queryset(queryset)
+        # ranked searches list the best matches first unless ?ordering= is
+        # given, the keyset pagination seeks on the ordering fields
+        ordering = recipe_filter.get_ordering()
+        if ordering is None:
+            ordering = ('-search_rank','-id') if 'search_rank' in queryset.query.annotations else ('-id',)
+        return queryset.order_by(*ordering).defer('search_vector').prefetch_related('tag','ingredient')
 
     def get_serializer_class(self):
         """:return apporpriate serializer for request if we want recipe's list return RecipeSerializer
@@ -80,17 +126,151 @@ class RecipeViewSet (viewsets.ModelViewSet):
         """Create a new recipe"""
         serializer.save(user=self.request.user)
 
+    def bulk_saved(self,objs):
+        update_search_vectors(obj.pk for obj in objs)
+
+    @action(methods=['GET'],detail=False)
+    def export(self,request):
+        """stream every recipe of the user, as NDJSON or as CSV with ?export_format=csv"""
+        export_format = request.query_params.get('export_format',EXPORT_NDJSON)
+        if export_format not in EXPORT_FORMATS:
+            return Response({'export_format':[_('Unknown export format.')]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        queryset = RecipeFilter(request.query_params).filter_queryset(
+            self.queryset.filter(user=request.user)
+        )
+        response = StreamingHttpResponse(
+            stream_export(queryset,export_format,settings.EXPORT_CHUNK_SIZE),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="recipes.{export_format}"'
+        return response
+
+    def _attach_image(self,recipe,name,sha256):
+        """point the recipe at an image already written to storage"""
+        previous = recipe.image.name
+        storage = recipe.image.storage
+        recipe.image.name = name
+        recipe.image_sha256 = sha256
+        recipe.save()
+        if previous and previous != name:
+            transaction.on_commit(lambda: release_image(storage,previous))
+        enqueue_image(recipe)
+
+    def _rejected(self,error):
+        return Response({'image':[error.message]},status=error.status_code)
+
     @action(methods=['POST'],detail=True,url_path='upload-image')
     def upload_image(self,request,pk=None):
-        """upload image to a recipe"""
+        """upload image to a recipe, streaming it straight to storage"""
         recipe = self.get_object()
-        serializer = self.get_serializer(
-            recipe,
-            request.data
+        storage = recipe.image.storage
+        handler = StreamingImageUploadHandler(
+            request._request,storage,'image',
+            settings.RECIPE_IMAGE_MAX_BYTES,settings.RECIPE_IMAGE_MAX_PIXELS
         )
+        request._request.upload_handlers = [handler]
+        image = request.data.get('image')
+        if handler.error is not None:
+            return self._rejected(handler.error)
+        if not isinstance(image,StoredImageFile):
+            return Response({'image':[_('No file was submitted.')]},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fmt = check_image_file(storage.path(image.storage_name),settings.RECIPE_IMAGE_MAX_PIXELS)
+        except ImageRejected as error:
+            handler.discard()
+            return self._rejected(error)
+
+        with transaction.atomic():
+            name = store_image(storage,image.storage_name,image.sha256,fmt)
+            self._attach_image(recipe,name,image.sha256)
+        serializer = self.get_serializer(recipe)
+        return Response(serializer.data,status=status.HTTP_200_OK)
+
+    @action(methods=['POST'],detail=True,url_path='image-uploads')
+    def create_image_upload(self,request,pk=None):
+        """start a resumable upload of the recipe image sent in chunks"""
+        recipe = self.get_object()
+        serializer = serializers.ImageUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        expire_uploads()
+        with transaction.atomic():
+            # uploads of a user are started one at a time so the cap holds
+            get_user_model().objects.select_for_update().filter(pk=request.user.pk).exists()
+            in_progress = ImageUpload.objects.filter(recipe__user=request.user).count()
+            if in_progress >= settings.RECIPE_IMAGE_MAX_UPLOADS:
+                return Response(
+                    {'detail':_('At most %(max)s image uploads can be in progress.')
+                        % {'max':settings.RECIPE_IMAGE_MAX_UPLOADS}},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS,
+                )
+            upload = serializer.save(recipe=recipe)
+        storage = recipe.image.storage
+        storage.save(upload.partial_name,ContentFile(b''))
+        return Response(serializer.data,status=status.HTTP_201_CREATED)
 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data,status=status.HTTP_200_OK)
+    @action(methods=['GET','PUT'],detail=True,url_name='image-upload-chunk',
+            url_path=r'image-uploads/(?P<upload_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})')
+    def image_upload_chunk(self,request,pk=None,upload_id=None):
+        """return the offset to resume a chunked upload from, or append the
+        chunk in the request body at the Upload-Offset header"""
+        recipe = self.get_object()
+        storage = recipe.image.storage
+        upload = get_object_or_404(ImageUpload,pk=upload_id,recipe=recipe)
+        serializer = serializers.ImageUploadSerializer(upload)
+        if request.method == 'GET':
+            return Response(serializer.data)
+
+        try:
+            offset = int(request.META['HTTP_UPLOAD_OFFSET'])
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except (KeyError,ValueError):
+            return Response({'detail':_('Upload-Offset and Content-Length headers are required.')},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if offset != upload.offset:
+            return Response(serializer.data,status=status.HTTP_409_CONFLICT)
+        if offset + length > upload.size:
+            return Response({'detail':_('chunk goes past the size of the upload')},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        path = storage.path(upload.partial_name)
+        chunk_path = receive_chunk(request.stream,length,path)
+        try:
+            with transaction.atomic():
+                upload = get_object_or_404(
+                    ImageUpload.objects.select_for_update(),pk=upload_id,recipe=recipe
+                )
+                # another request may have appended at the offset meanwhile
+                if upload.offset != offset:
+                    return Response(serializers.ImageUploadSerializer(upload).data,
+                                    status=status.HTTP_409_CONFLICT)
+                try:
+                    append_chunk(upload,chunk_path,path,settings.RECIPE_IMAGE_MAX_PIXELS)
+                    if upload.offset < upload.size:
+                        return Response(serializers.ImageUploadSerializer(upload).data)
+                    name,sha256 = finish_upload(upload,storage,settings.RECIPE_IMAGE_MAX_PIXELS)
+                except ImageRejected as error:
+                    upload.delete()
+                    return self._rejected(error)
+                upload.delete()
+                self._attach_image(recipe,name,sha256)
+        finally:
+            os.remove(chunk_path)
 
-        return Response(serializer.errors,status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+        serializer = serializers.RecipeImageSrializer(recipe,context=self.get_serializer_context())
+        return Response(serializer.data,status=status.HTTP_200_OK)
+
+    @action(methods=['GET'],detail=True,url_name='image-rendition',
+            url_path=r'image/(?P<width>[0-9]+)w\.(?P<ext>webp|jpeg)')
+    def image_rendition(self,request,pk=None,width=None,ext=None):
+        """return a scaled rendition of the recipe image, rendering it on first use"""
+        recipe = self.get_object()
+        width = int(width)
+        if (width not in settings.RECIPE_IMAGE_WIDTHS or not recipe.image
+                or recipe.image_status != Recipe.IMAGE_READY):
+            raise Http404
+        name = get_rendition(recipe,width,ext)
+        response = media_response(request,recipe.image.storage,name,immutable=True)
+        patch_cache_control(response,private=True)
+        return response
@@ -1,6 +1,10 @@
-from django.test import TestCase
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from core.authentication import token_cache
 
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -19,6 +23,8 @@ class PublicUserApiTests(TestCase):
     """Test the users API (public)"""
 
     def setUp(self):
+        cache.clear()
+        token_cache().clear()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -100,6 +106,90 @@ class PublicUserApiTests(TestCase):
         res = self.client.get(ME_URL)
         self.assertEqual(res.status_code,status.HTTP_401_UNAUTHORIZED)
 
+class LoginThrottleTests(TestCase):
+    """test throttling of the token endpoint"""
+
+    def setUp(self):
+        cache.clear()
+        token_cache().clear()
+        self.client = APIClient()
+        create_user(email="test@gmail.com", password="test1234")
+
+    @patch('user.throttles.LoginEmailRateThrottle.rate', '2/min', create=True)
+    def test_email_throttled_before_authenticating(self):
+        """test attempts over the per email rate are rejected unhashed"""
+        payload = {'email': "test@gmail.com", 'password': "wrong"}
+        self.client.post(TOKEN_URL, payload)
+        self.client.post(TOKEN_URL, payload)
+
+        with patch('user.serializers.authenticate') as authenticate:
+            res = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        authenticate.assert_not_called()
+
+    @patch('user.throttles.LoginIPRateThrottle.rate', '2/min', create=True)
+    def test_ip_throttled_across_emails(self):
+        """test attempts over the per ip rate are rejected"""
+        for i in range(2):
+            self.client.post(TOKEN_URL, {'email': f'{i}@gmail.com', 'password': 'pw'})
+
+        res = self.client.post(TOKEN_URL, {'email': 'other@gmail.com', 'password': 'pw'})
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @patch('user.throttles.LoginIPRateThrottle.rate', '2/min', create=True)
+    def test_forwarded_for_ignored(self):
+        """test a forged X-Forwarded-For header does not get around the ip rate"""
+        for i in range(2):
+            self.client.post(TOKEN_URL, {'email': f'{i}@gmail.com', 'password': 'pw'},
+                             HTTP_X_FORWARDED_FOR=f'10.0.0.{i}')
+
+        res = self.client.post(TOKEN_URL, {'email': 'other@gmail.com', 'password': 'pw'},
+                               HTTP_X_FORWARDED_FOR='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_malformed_body_rejected(self):
+        """test bodies that are not an object with a text email are a bad request"""
+        for payload in ([1, 2], {'email': ['a'], 'password': 'pw'}, {'email': 5, 'password': 'pw'}):
+            with self.subTest(payload=payload):
+                res = self.client.post(TOKEN_URL, payload, format='json')
+
+                self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(TOKEN_CACHE_ENABLED=True)
+    def test_token_reused(self):
+        """test repeated logins return the same cached token"""
+        payload = {'email': "test@gmail.com", 'password': "test1234"}
+        first = self.client.post(TOKEN_URL, payload)
+        second = self.client.post(TOKEN_URL, payload)
+
+        self.assertEqual(first.data['token'], second.data['token'])
+        self.assertEqual(Token.objects.count(), 1)
+
+
+@override_settings(TOKEN_CACHE_ENABLED=True)
+class TokenCacheTests(TransactionTestCase):
+    """test the cached tokens of the token endpoint, dropped on commit"""
+
+    def setUp(self):
+        token_cache().clear()
+        self.client = APIClient()
+        create_user(email="test@gmail.com", password="test1234")
+
+    def test_deleted_token_replaced(self):
+        """test a new token is issued after the cached one is deleted"""
+        payload = {'email': "test@gmail.com", 'password': "test1234"}
+        first = self.client.post(TOKEN_URL, payload)
+        Token.objects.all().delete()
+
+        second = self.client.post(TOKEN_URL, payload)
+
+        self.assertNotEqual(first.data['token'], second.data['token'])
+        self.assertTrue(Token.objects.filter(key=second.data['token']).exists())
+
+
 class PrivateUserApiTest(TestCase):
     """test the user api (private)"""
 
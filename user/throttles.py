@@ -0,0 +1,35 @@
+import hashlib
+from collections.abc import Mapping
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginIPRateThrottle(SimpleRateThrottle):
+    """limit login attempts per client ip before any password is hashed
+
+    X-Forwarded-For is only trusted for the NUM_PROXIES proxies in front
+    """
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': self.get_ident(request),
+        }
+
+
+class LoginEmailRateThrottle(SimpleRateThrottle):
+    """limit login attempts per account, whatever ip they come from"""
+    scope = 'login_email'
+
+    def get_cache_key(self, request, view):
+        # malformed bodies are left to the serializer to reject
+        if not isinstance(request.data, Mapping):
+            return None
+        email = request.data.get('email')
+        if not isinstance(email, str) or not email.strip():
+            return None
+        ident = hashlib.sha256(email.strip().lower().encode('utf-8')).hexdigest()
+        return self.cache_format % {
+            'scope': self.scope,
+            'ident': ident,
+        }
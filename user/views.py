@@ -1,7 +1,11 @@
-from rest_framework import generics, authentication,permissions
+from rest_framework import generics,permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
+from core.authentication import CachedTokenAuthentication, get_user_token
+from core.routers import ReplicaReadMixin
 from user.serializers import UserSerializer , AuthTokenSerializer
+from user.throttles import LoginEmailRateThrottle, LoginIPRateThrottle
 
 
 
@@ -14,12 +18,21 @@ class CreateTokenView(ObtainAuthToken):
     """create a new auth token for user"""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = (LoginIPRateThrottle, LoginEmailRateThrottle)
 
+    def post(self, request, *args, **kwargs):
+        """check the credentials and return the user's token"""
+        serializer = self.serializer_class(data=request.data,
+                                           context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data['user']
+        return Response({'token': get_user_token(user)})
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
-    """manage the authenticated user"""
+
+class ManageUserView(ReplicaReadMixin,generics.RetrieveUpdateAPIView):
+    """manage the authenticated user, updates pin the user to the primary"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):